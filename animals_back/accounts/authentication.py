@@ -0,0 +1,132 @@
+# accounts/authentication.py
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from animals.cache import incrementer_version, version
+
+
+def cle_utilisateur(user_id):
+    """ Clé de l'utilisateur en cache : id + version d'authentification (changée à chaque enregistrement). """
+    return f'auth:utilisateur:{user_id}:{version(f"auth:{user_id}")}'
+
+
+def utilisateur_en_cache(user_id):
+    """
+    Utilisateur `user_id` (ou None), relu au plus toutes les AUTH_USER_CACHE_TTL secondes.
+    Les enregistrements de l'utilisateur invalident l'entrée (signals.py) ; un
+    QuerySet.update() sur Utilisateur doit appeler invalider_utilisateur lui-même.
+    """
+    cle = cle_utilisateur(user_id)
+    user = cache.get(cle)
+    if user is None:
+        user = get_user_model().objects.filter(id=user_id).first()
+        if user is not None:
+            cache.set(cle, user, getattr(settings, 'AUTH_USER_CACHE_TTL', 60))
+    return user
+
+
+def invalider_utilisateur(user_id):
+    incrementer_version(f'auth:{user_id}')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """ JWTAuthentication dont la lecture de l'utilisateur passe par utilisateur_en_cache. """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = utilisateur_en_cache(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class UtilisateurJeton:
+    """
+    Utilisateur construit à partir des claims d'un jeton vérifié, sans requête.
+    Les champs absents du jeton (is_staff, telephone...) chargent l'Utilisateur
+    complet à la première lecture, via utilisateur_en_cache. À utiliser avec
+    `utilisateur_id=request.user.id` dans les filtres : ce n'est pas une instance de modèle.
+    """
+    CLAIMS = ('email', 'nom', 'prenom', 'role')
+
+    __slots__ = ('id', *CLAIMS, '_utilisateur')
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        # simplejwt sérialise l'identifiant en chaîne
+        self.id = get_user_model()._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+        self._utilisateur = None
+        for claim in self.CLAIMS:
+            # Jetons sans claims personnalisés (ex. RefreshToken.for_user) : chargement paresseux
+            if claim in token:
+                setattr(self, claim, token[claim])
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def utilisateur(self):
+        if self._utilisateur is None:
+            self._utilisateur = utilisateur_en_cache(self.id)
+            if self._utilisateur is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        return self._utilisateur
+
+    def __getattr__(self, nom):
+        # Appelé seulement pour ce qui n'est ni un slot renseigné ni un attribut de classe
+        if nom.startswith('__') or nom == '_utilisateur':
+            raise AttributeError(nom)
+        return getattr(self.utilisateur, nom)
+
+    def __eq__(self, autre):
+        return getattr(autre, 'pk', None) == self.id and getattr(autre, 'is_authenticated', False)
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __str__(self):
+        return str(getattr(self, 'email', self.id))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT sans lecture de l'utilisateur : request.user est un UtilisateurJeton.
+    Un compte désactivé reste accepté jusqu'à l'expiration du jeton d'accès
+    (ACCESS_TOKEN_LIFETIME) : réservé aux lectures.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        return UtilisateurJeton(validated_token)
+
+
+def authentification_sans_requete():
+    """ Classes par défaut de REST_FRAMEWORK, le JWT remplacé par StatelessJWTAuthentication. """
+    from rest_framework.settings import api_settings as drf_settings
+
+    return [StatelessJWTAuthentication] + [
+        classe for classe in drf_settings.DEFAULT_AUTHENTICATION_CLASSES
+        if not issubclass(classe, JWTAuthentication)
+    ]
@@ -0,0 +1,105 @@
+# accounts/emails.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailSortant
+
+logger = logging.getLogger(__name__)
+
+
+def mettre_en_file(sujet, corps, destinataires, expediteur=None):
+    """
+    Enregistre un email à envoyer. Écrit dans la transaction de l'appelant :
+    si la requête échoue, l'email n'est jamais envoyé.
+    """
+    return EmailSortant.objects.create(
+        sujet=sujet,
+        corps=corps,
+        expediteur=expediteur or settings.DEFAULT_FROM_EMAIL,
+        destinataires=list(destinataires),
+    )
+
+
+def delai_avant_essai(tentatives):
+    """ Attente exponentielle après `tentatives` échecs : base, 2×base, 4×base... plafonnée. """
+    base = getattr(settings, 'EMAIL_OUTBOX_DELAI_BASE', 60)
+    return timedelta(seconds=min(base * 2 ** (tentatives - 1), getattr(settings, 'EMAIL_OUTBOX_DELAI_MAX', 3600)))
+
+
+def _echec(email, erreur, maintenant):
+    email.tentatives += 1
+    email.derniere_erreur = f'{type(erreur).__name__}: {erreur}'
+    if email.tentatives >= getattr(settings, 'EMAIL_OUTBOX_MAX_TENTATIVES', 5):
+        email.statut = EmailSortant.ECHEC
+        logger.error("Email %s abandonné après %s tentatives : %s", email.id, email.tentatives, erreur)
+    else:
+        email.prochain_essai = maintenant + delai_avant_essai(email.tentatives)
+
+
+def envoyer_lot(taille_lot=50, connexion=None):
+    """
+    Envoie au plus `taille_lot` emails échus sur une seule connexion SMTP.
+    Les lignes sont verrouillées avec SKIP LOCKED : plusieurs workers se
+    partagent la file sans envoyer deux fois le même message. Un échec
+    reprogramme le message seul. Renvoie (envoyés, échoués).
+    """
+    maintenant = timezone.now()
+    with transaction.atomic():
+        lot = list(
+            EmailSortant.objects.select_for_update(skip_locked=True)
+            .filter(statut=EmailSortant.EN_ATTENTE, prochain_essai__lte=maintenant)
+            .order_by('prochain_essai', 'id')[:taille_lot]
+        )
+        if not lot:
+            return 0, 0
+
+        connexion = connexion or get_connection()
+        envoyes, echoues = [], []
+        try:
+            connexion.open()
+        except Exception as e:
+            for email in lot:
+                _echec(email, e, maintenant)
+            echoues = lot
+        else:
+            try:
+                for email in lot:
+                    message = EmailMessage(email.sujet, email.corps, email.expediteur, email.destinataires,
+                                           connection=connexion)
+                    try:
+                        # Rouvre la connexion si un échec précédent l'a fermée (sinon sans effet)
+                        connexion.open()
+                        # Un message à la fois : un refus n'interrompt pas le reste du lot
+                        connexion.send_messages([message])
+                    except Exception as e:
+                        _echec(email, e, maintenant)
+                        echoues.append(email)
+                        # Connexion peut-être rompue
+                        connexion.close()
+                    else:
+                        email.statut, email.date_envoi, email.tentatives = (
+                            EmailSortant.ENVOYE, timezone.now(), email.tentatives + 1
+                        )
+                        envoyes.append(email)
+            finally:
+                connexion.close()
+
+        EmailSortant.objects.bulk_update(
+            lot, ['statut', 'tentatives', 'prochain_essai', 'derniere_erreur', 'date_envoi']
+        )
+    return len(envoyes), len(echoues)
+
+
+def vider_file(taille_lot=50, connexion=None):
+    """ Enchaîne les lots jusqu'à ce qu'il n'y ait plus d'email échu. Renvoie (envoyés, échoués). """
+    total_envoyes = total_echoues = 0
+    while True:
+        envoyes, echoues = envoyer_lot(taille_lot, connexion)
+        if not envoyes and not echoues:
+            return total_envoyes, total_echoues
+        total_envoyes, total_echoues = total_envoyes + envoyes, total_echoues + echoues
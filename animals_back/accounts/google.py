@@ -0,0 +1,154 @@
+# accounts/google.py
+import email.utils
+import json
+import re
+import threading
+import time
+
+import jwt
+from django.conf import settings
+from google.auth import exceptions as google_exceptions
+from google.auth import jwt as google_jwt
+
+# Certificats PEM indexés par `kid` (ceux qu'utilise id_token.verify_oauth2_token)
+URL_CERTIFICATS = 'https://www.googleapis.com/oauth2/v1/certs'
+
+EMETTEURS = ('accounts.google.com', 'https://accounts.google.com')
+
+# Durée par défaut quand la réponse ne porte ni max-age ni Expires
+DUREE_DEFAUT = 300
+
+# Un `kid` absent après rechargement n'en redéclenche pas avant DELAI_NEGATIF secondes,
+# pas plus qu'un échec de chargement : un jeton forgé ou une panne de Google ne
+# provoquent pas un appel HTTP par requête
+DELAI_NEGATIF = 60
+
+# Intervalle minimal entre deux rechargements pour des `kid` inconnus différents
+DELAI_ROTATION = 5
+
+
+def duree_de_vie(entetes, maintenant=None):
+    """ Secondes de validité d'une réponse d'après Cache-Control (max-age - Age) ou Expires. """
+    entetes = {cle.lower(): valeur for cle, valeur in entetes.items()}
+    controle = entetes.get('cache-control', '')
+    if re.search(r'\b(no-store|no-cache)\b', controle):
+        return 0
+    max_age = re.search(r'\bmax-age=(\d+)', controle)
+    if max_age:
+        return max(int(max_age.group(1)) - int(entetes.get('age') or 0), 0)
+    if entetes.get('expires'):
+        try:
+            expire = email.utils.parsedate_to_datetime(entetes['expires']).timestamp()
+            date = email.utils.parsedate_to_datetime(entetes['date']).timestamp() if entetes.get('date') else None
+        except (TypeError, ValueError):
+            return 0
+        return max(expire - (date or maintenant or time.time()), 0)
+    return DUREE_DEFAUT
+
+
+class CertificatsGoogle:
+    """
+    Cache en mémoire des certificats de signature de Google, valable le temps
+    annoncé par les en-têtes HTTP. Un `kid` absent déclenche un rechargement
+    (rotation des clés). `transport` est un google.auth.transport.Request (ou
+    tout appelable compatible, ex. un serveur de clés local en test).
+    """
+
+    def __init__(self, transport=None, url=URL_CERTIFICATS,
+                 delai_negatif=DELAI_NEGATIF, delai_rotation=DELAI_ROTATION):
+        self._transport = transport
+        self.url = url
+        self.delai_negatif = delai_negatif
+        self.delai_rotation = delai_rotation
+        self._verrou = threading.Lock()
+        self.vider()
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            # Une session requests réutilisée (connexions keep-alive)
+            from google.auth.transport.requests import Request
+            self._transport = Request()
+        return self._transport
+
+    def _recharger(self, maintenant):
+        reponse = self.transport(self.url, method='GET')
+        if reponse.status != 200:
+            raise google_exceptions.TransportError(
+                f'Certificats Google indisponibles (HTTP {reponse.status})'
+            )
+        donnees = reponse.data.decode('utf-8') if isinstance(reponse.data, bytes) else reponse.data
+        self._certificats = json.loads(donnees)
+        self._charge_a = maintenant
+        self._expire_a = maintenant + duree_de_vie(reponse.headers)
+
+    def _a_recharger(self, kid, maintenant):
+        if maintenant >= self._expire_a:
+            return maintenant - self._echec_a >= self.delai_negatif
+        if kid is None or kid in self._certificats:
+            return False
+        return (self._kids_absents.get(kid, float('-inf')) <= maintenant
+                and maintenant - self._charge_a >= self.delai_rotation)
+
+    def certificats(self, kid=None):
+        """ Certificats en cache, rechargés s'ils ont expiré ou si `kid` n'y figure pas. """
+        with self._verrou:
+            maintenant = time.monotonic()
+            if self._a_recharger(kid, maintenant):
+                try:
+                    self._recharger(maintenant)
+                except google_exceptions.TransportError:
+                    self._echec_a = maintenant
+                    # Les anciens certificats restent utilisables jusqu'au prochain essai
+                    if not self._certificats:
+                        raise
+                if kid is not None and kid not in self._certificats:
+                    self._kids_absents = {
+                        autre: limite for autre, limite in self._kids_absents.items() if limite > maintenant
+                    }
+                    self._kids_absents[kid] = maintenant + self.delai_negatif
+            elif not self._certificats:
+                raise google_exceptions.TransportError('Certificats Google indisponibles')
+            return self._certificats
+
+    def vider(self):
+        self._certificats, self._kids_absents = {}, {}
+        self._expire_a = 0.0
+        self._charge_a = self._echec_a = float('-inf')
+
+
+certificats_google = CertificatsGoogle()
+
+
+def est_jeton_google(token):
+    """
+    Pré-contrôle sans vérification de signature : algorithme RS256 et émetteur Google.
+    Les jetons HS256 de l'application n'entraînent ainsi jamais d'appel à Google.
+    """
+    try:
+        entete = jwt.get_unverified_header(token)
+        emetteur = jwt.decode(token, options={'verify_signature': False}).get('iss')
+    except jwt.InvalidTokenError:
+        return False
+    return entete.get('alg') == 'RS256' and emetteur in EMETTEURS
+
+
+def verifier_id_token(token, audience=None, clock_skew_in_seconds=0, certificats=None):
+    """
+    Équivalent de id_token.verify_oauth2_token avec les certificats en cache.
+    Lève ValueError (jeton invalide) ou google.auth.exceptions.TransportError.
+    """
+    certificats = certificats or certificats_google
+    try:
+        kid = jwt.get_unverified_header(token).get('kid')
+    except jwt.InvalidTokenError as e:
+        raise ValueError(str(e)) from e
+    idinfo = google_jwt.decode(
+        token,
+        certs=certificats.certificats(kid),
+        audience=audience or settings.GOOGLE_CLIENT_ID,
+        clock_skew_in_seconds=clock_skew_in_seconds,
+    )
+    if idinfo.get('iss') not in EMETTEURS:
+        raise ValueError(f"Wrong issuer: {idinfo.get('iss')}")
+    return idinfo
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from accounts.emails import vider_file
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails en file (EmailSortant) par lots, sur une connexion SMTP par lot"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=50)
+        parser.add_argument('--boucle', action='store_true',
+                            help="Tourne en continu")
+        parser.add_argument('--intervalle', type=int, default=5,
+                            help="Attente entre deux passages en mode boucle (secondes)")
+
+    def handle(self, *args, **options):
+        while True:
+            envoyes, echoues = vider_file(taille_lot=options['taille_lot'])
+            if envoyes or echoues or options['verbosity'] > 1:
+                self.stdout.write(f"{envoyes} email(s) envoyé(s), {echoues} échec(s) reprogrammé(s)")
+            if not options['boucle']:
+                return
+            connection.close()
+            time.sleep(options['intervalle'])
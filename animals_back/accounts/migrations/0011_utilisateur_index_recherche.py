@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:20
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# UPPER(...) : expression produite par les lookups istartswith / icontains de Django
+INDEX_RECHERCHE = {
+    'accounts_utilisateur_nom_upper_trgm': 'UPPER(nom) gin_trgm_ops',
+    'accounts_utilisateur_prenom_upper_trgm': 'UPPER(prenom) gin_trgm_ops',
+    'accounts_utilisateur_email_upper_trgm': 'UPPER(email) gin_trgm_ops',
+    # Opérateur % (trigram_similar)
+    'accounts_utilisateur_nom_trgm': 'nom gin_trgm_ops',
+    'accounts_utilisateur_prenom_trgm': 'prenom gin_trgm_ops',
+}
+
+
+def creer_index_recherche(apps, schema_editor):
+    # GIN indexes only exist on PostgreSQL; other backends scan for the prefix
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nom, expression in INDEX_RECHERCHE.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nom} ON accounts_utilisateur USING gin ({expression})'
+        )
+
+
+def supprimer_index_recherche(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nom in INDEX_RECHERCHE:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nom}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_delete_donation'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(creer_index_recherche, supprimer_index_recherche),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_utilisateur_index_recherche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSortant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sujet', models.CharField(max_length=255)),
+                ('corps', models.TextField()),
+                ('expediteur', models.CharField(max_length=254)),
+                ('destinataires', models.JSONField(default=list)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('envoye', 'Envoyé'), ('echec', 'Échec')], default='en_attente', max_length=20)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('prochain_essai', models.DateTimeField(default=django.utils.timezone.now)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('statut', 'en_attente')), fields=['prochain_essai', 'id'], name='email_sortant_a_envoyer')],
+            },
+        ),
+    ]
@@ -4,11 +4,14 @@ from django.db import models
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
 from django.contrib.auth import get_user_model
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from google.auth.exceptions import GoogleAuthError
 from django.conf import settings
+from django.utils import timezone
 import jwt
 
+from .authentication import utilisateur_en_cache
+from .google import est_jeton_google, verifier_id_token
+
 #superuser
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -71,46 +74,72 @@ class CustomAuthentication(BaseAuthentication):
             if auth_type.lower() != 'bearer':
                 return None
 
-            # First try to validate as a regular JWT token
-            try:
-                # Decode JWT token
-                payload = jwt.decode(
-                    token,
-                    settings.SECRET_KEY,
-                    algorithms=['HS256']
-                )
-                user = Utilisateur.objects.get(id=payload['user_id'])
-                return (user, None)
-            except (jwt.InvalidTokenError, Utilisateur.DoesNotExist):
-                # If JWT validation fails, try Google token
+            # Jetons de l'application (HS256) : vérification locale uniquement
+            if not est_jeton_google(token):
                 try:
-                    idinfo = id_token.verify_oauth2_token(
-                        token, 
-                        requests.Request(), 
-                        settings.GOOGLE_CLIENT_ID
+                    payload = jwt.decode(
+                        token,
+                        settings.SECRET_KEY,
+                        algorithms=['HS256']
                     )
-                    
-                    if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
-                        return None
-                    
-                    # Get or create user based on Google info
-                    email = idinfo['email']
-                    try:
-                        user = Utilisateur.objects.get(email=email)
-                    except Utilisateur.DoesNotExist:
-                        # Create new user with all required fields
-                        user = Utilisateur.objects.create_user(
-                            email=email,
-                            password=None,  # No password for Google users
-                            nom=idinfo.get('family_name', ''),
-                            prenom=idinfo.get('given_name', ''),
-                            telephone='',  # Default empty value
-                            role='Proprietaire',  # Default role
-                            adresse=''  # Default empty value
-                        )
-                    return (user, None)
-                except ValueError:
+                except jwt.InvalidTokenError:
+                    return None
+                user = utilisateur_en_cache(payload['user_id'])
+                if user is None:
                     return None
+                return (user, None)
+
+            # Jeton Google : certificats en cache (accounts/google.py)
+            try:
+                idinfo = verifier_id_token(token, settings.GOOGLE_CLIENT_ID)
+            except (ValueError, GoogleAuthError):
+                return None
+
+            # Get or create user based on Google info
+            email = idinfo['email']
+            try:
+                user = Utilisateur.objects.get(email=email)
+            except Utilisateur.DoesNotExist:
+                # Create new user with all required fields
+                user = Utilisateur.objects.create_user(
+                    email=email,
+                    password=None,  # No password for Google users
+                    nom=idinfo.get('family_name', ''),
+                    prenom=idinfo.get('given_name', ''),
+                    telephone='',  # Default empty value
+                    role='Proprietaire',  # Default role
+                    adresse=''  # Default empty value
+                )
+            return (user, None)
         except Exception as e:
             print(logger.error(f"Authentication error: {str(e)}"))
             return None
+
+
+class EmailSortant(models.Model):
+    """ File d'envoi des emails transactionnels, vidée par la commande envoyer_emails (accounts/emails.py). """
+    EN_ATTENTE = 'en_attente'
+    ENVOYE = 'envoye'
+    ECHEC = 'echec'
+    STATUTS = [(EN_ATTENTE, 'En attente'), (ENVOYE, 'Envoyé'), (ECHEC, 'Échec')]
+
+    sujet = models.CharField(max_length=255)
+    corps = models.TextField()
+    expediteur = models.CharField(max_length=254)
+    destinataires = models.JSONField(default=list)
+    statut = models.CharField(max_length=20, choices=STATUTS, default=EN_ATTENTE)
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    prochain_essai = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_envoi = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Seuls les messages en attente sont parcourus par le worker
+            models.Index(fields=['prochain_essai', 'id'], condition=models.Q(statut='en_attente'),
+                         name='email_sortant_a_envoyer'),
+        ]
+
+    def __str__(self):
+        return f"{self.sujet} -> {', '.join(self.destinataires)} ({self.statut})"
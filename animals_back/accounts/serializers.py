@@ -14,10 +14,17 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'nom', 'prenom', 'email', 'telephone', 'role', 'adresse', 'password', 'profilepicture']
         extra_kwargs = {'password': {'write_only': True}}
+
+    def __init__(self, *args, champs=None, **kwargs):
+        # `champs` : projection demandée (user_list ?fields=), les autres champs sont retirés
+        super().__init__(*args, **kwargs)
+        if champs is not None:
+            for nom in set(self.fields) - set(champs):
+                self.fields.pop(nom)
     
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        if instance.profilepicture:
+        if 'profilepicture' in representation and instance.profilepicture:
             request = self.context.get('request')
             if request is not None:
                 representation['profilepicture'] = request.build_absolute_uri(instance.profilepicture.url)
@@ -0,0 +1,17 @@
+# accounts/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalider_utilisateur
+from .models import Utilisateur
+
+
+@receiver(post_save, sender=Utilisateur)
+@receiver(post_delete, sender=Utilisateur)
+def invalider_cache_auth(sender, instance, **kwargs):
+    # Profil, mot de passe (update_user_profile, password_reset_confirm), is_active...
+    # Après le commit : une requête intercalée mettrait sinon l'ancienne ligne en
+    # cache sous la nouvelle version, pour AUTH_USER_CACHE_TTL
+    pk = instance.pk
+    transaction.on_commit(lambda: invalider_utilisateur(pk))
@@ -1,3 +1,323 @@
-from django.test import TestCase
+import json
+import smtplib
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends import locmem
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from google.auth import crypt, jwt as google_jwt
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import google
+from .authentication import UtilisateurJeton, utilisateur_en_cache
+from .emails import envoyer_lot, mettre_en_file, vider_file
+from .google import duree_de_vie, verifier_id_token
+from .models import CustomAuthentication, EmailSortant
+from .serializers import MyTokenObtainPairSerializer
+
+
+class CacheAuthentificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='auth@test.tn', password='secret', nom='Auth', prenom='Test',
+            telephone='0000', role='Proprietaire', adresse='Sfax',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_repeated_requests_skip_the_user_query(self):
+        requetes = []
+        for _ in range(20):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('get_user_profile'))
+            self.assertEqual(response.status_code, 200)
+            requetes.append(len(queries))
+        # Sans cache : une lecture d'Utilisateur par requête ; avec : seulement la première
+        self.assertEqual(requetes[0], 1)
+        self.assertEqual(sum(requetes[1:]), 0)
+
+    def test_profile_and_password_changes_invalidate_the_cached_user(self):
+        self.assertEqual(utilisateur_en_cache(self.user.id).nom, 'Auth')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(reverse('update_user_profile'), {'nom': 'Renommé'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('get_user_profile')).json()['nom'], 'Renommé')
+
+        self.user.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('nouveau')
+            self.user.save()
+            # Version changée seulement au commit : une lecture intercalée ne met pas
+            # l'ancienne ligne en cache sous la nouvelle version
+            self.assertFalse(utilisateur_en_cache(self.user.id).check_password('nouveau'))
+        self.assertTrue(utilisateur_en_cache(self.user.id).check_password('nouveau'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get(reverse('get_user_profile')).status_code, 401)
+
+
+def _cle_et_certificat():
+    cle = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    nom = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'test')])
+    certificat = (
+        x509.CertificateBuilder().subject_name(nom).issuer_name(nom).public_key(cle.public_key())
+        .serial_number(1).not_valid_before(datetime(2020, 1, 1)).not_valid_after(datetime(2100, 1, 1))
+        .sign(cle, hashes.SHA256())
+    )
+    return (
+        cle.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                          serialization.NoEncryption()),
+        certificat.public_bytes(serialization.Encoding.PEM).decode(),
+    )
+
+
+class ServeurClesLocal:
+    """ Transport google.auth : sert les certificats courants et compte les appels. """
+
+    def __init__(self):
+        self.certificats, self.appels, self.entetes = {}, 0, {'Cache-Control': 'public, max-age=3600'}
+
+    def __call__(self, url, method='GET', **kwargs):
+        self.appels += 1
+        return SimpleNamespace(status=200, headers=self.entetes, data=json.dumps(self.certificats).encode())
+
+
+class CertificatsGoogleTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cles = {kid: _cle_et_certificat() for kid in ('k1', 'k2')}
+
+    def setUp(self):
+        self.serveur = ServeurClesLocal()
+        self.serveur.certificats = {'k1': self.cles['k1'][1]}
+        self.certificats = google.CertificatsGoogle(transport=self.serveur, delai_rotation=0)
+        patch = mock.patch.object(google, 'certificats_google', self.certificats)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def jeton(self, kid='k1', cle=None, **claims):
+        maintenant = int(time.time())
+        payload = {'iss': 'https://accounts.google.com', 'aud': settings.GOOGLE_CLIENT_ID,
+                   'iat': maintenant, 'exp': maintenant + 600, 'email': 'google@test.tn',
+                   'given_name': 'G', 'family_name': 'User', **claims}
+        signer = crypt.RSASigner.from_string(self.cles[cle or kid][0], key_id=kid)
+        return google_jwt.encode(signer, payload).decode()
+
+    def test_certificates_are_cached_and_refreshed_on_key_rotation(self):
+        for _ in range(5):
+            self.assertEqual(verifier_id_token(self.jeton())['email'], 'google@test.tn')
+        self.assertEqual(self.serveur.appels, 1)
+
+        # Rotation : k2 publié, un jeton signé par k2 déclenche un seul rechargement
+        self.serveur.certificats['k2'] = self.cles['k2'][1]
+        verifier_id_token(self.jeton('k2'))
+        verifier_id_token(self.jeton('k2'))
+        self.assertEqual(self.serveur.appels, 2)
+
+        # Signature ou émetteur invalides : aucun rechargement
+        with self.assertRaises(ValueError):
+            verifier_id_token(self.jeton('k1', iss='evil'))
+        with self.assertRaises(ValueError):
+            verifier_id_token(self.jeton('k2', cle='k1'))
+        self.assertEqual(self.serveur.appels, 2)
+
+        # kid inconnu : un seul rechargement, puis absence mise en cache
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                verifier_id_token(self.jeton('k3', cle='k1'))
+        self.assertEqual(self.serveur.appels, 3)
+
+    def test_cache_headers(self):
+        self.assertEqual(duree_de_vie({'Cache-Control': 'public, max-age=20000', 'Age': '500'}), 19500)
+        self.assertEqual(duree_de_vie({'cache-control': 'no-cache'}), 0)
+        self.assertEqual(duree_de_vie({
+            'Date': 'Sun, 18 Oct 2026 10:00:00 GMT', 'Expires': 'Sun, 18 Oct 2026 11:00:00 GMT',
+        }), 3600)
+
+    def test_local_tokens_never_reach_google(self):
+        user = get_user_model().objects.create_user(
+            email='local@test.tn', password='secret', nom='Local', prenom='Test',
+            telephone='0000', role='Proprietaire', adresse='Sfax',
+        )
+        authentification = CustomAuthentication()
+        expire = AccessToken.for_user(user)
+        expire.set_exp(lifetime=-timedelta(minutes=1))
+        for jeton, attendu in ((str(AccessToken.for_user(user)), user), (str(expire), None)):
+            requete = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {jeton}')
+            resultat = authentification.authenticate(requete)
+            self.assertEqual(resultat and resultat[0], attendu)
+        self.assertEqual(self.serveur.appels, 0)
+
+        requete = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.jeton()}')
+        self.assertEqual(authentification.authenticate(requete)[0].email, 'google@test.tn')
+        self.assertEqual(self.serveur.appels, 1)
+
+
+class AuthentificationSansRequeteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='jeton@test.tn', password='secret', nom='Jeton', prenom='Test',
+            telephone='0000', role='Promeneur', adresse='Sfax',
+        )
+        self.jeton = MyTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.jeton}')
+
+    def test_opted_in_lists_run_only_their_own_query(self):
+        for nom in ('notifications-list', 'user-demandes-marche', 'mes-animaux-temporaire', 'mes-animaux-definitive'):
+            with self.assertNumQueries(1):
+                response = self.client.get(reverse(nom))
+            self.assertEqual(response.status_code, 200, nom)
+
+    def test_claims_are_read_from_the_token_and_other_fields_lazily(self):
+        user = UtilisateurJeton(self.jeton)
+        with self.assertNumQueries(0):
+            self.assertEqual((user.pk, user.email, user.nom, user.role), (self.user.id, 'jeton@test.tn', 'Jeton', 'Promeneur'))
+            self.assertTrue(user.is_authenticated)
+            self.assertEqual(user, self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.telephone, '0000')
+            self.assertFalse(user.is_staff)
+        with self.assertRaises(AttributeError):
+            user.attribut_inconnu = 1
+
+
+class AnnuaireUtilisateursTests(TestCase):
+    def setUp(self):
+        Utilisateur = get_user_model()
+        self.users = [
+            Utilisateur.objects.create_user(
+                email=f'membre{i}@test.tn', password='secret', nom=nom, prenom='Test',
+                telephone='0000', role='Promeneur' if i % 2 else 'Proprietaire', adresse='Sfax',
+            )
+            for i, nom in enumerate(['Ben Ali', 'Trabelsi', 'Benali', 'Jaziri', 'Bouzid', 'Karray', 'Belhaj'])
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_cursor_pages_with_projection_and_filters(self):
+        ids, cursor = [], ''
+        while True:
+            params = {'page_size': 3, 'fields': 'nom,email', 'role': 'Proprietaire'}
+            if cursor:
+                params['cursor'] = cursor
+            with self.assertNumQueries(1):
+                page = self.client.get(reverse('user-list'), params).json()
+            self.assertTrue(all(set(user) == {'nom', 'email'} for user in page['results']))
+            ids += [user['email'] for user in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(ids, [user.email for user in self.users if user.role == 'Proprietaire'])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('user-list'), {'page_size': 3, 'fields': 'nom'})
+        self.assertNotIn('telephone', queries[-1]['sql'])
+
+    def test_prefix_search_and_validation(self):
+        response = self.client.get(reverse('user-list'), {'search': 'ben', 'page_size': 10, 'fields': 'nom'})
+        self.assertEqual(sorted(user['nom'] for user in response.json()['results']), ['Ben Ali', 'Benali'])
+        response = self.client.get(reverse('user-list'), {'search': 'membre3@', 'fields': 'nom'})
+        self.assertEqual(response.json(), [{'nom': 'Jaziri'}])
+
+        self.assertEqual(self.client.get(reverse('user-list'), {'fields': 'password'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('user-list'), {'role': 'Admin'}).status_code, 400)
+        self.assertEqual(len(self.client.get(reverse('user-list')).json()), 7)
+
+
+class BackendInstable(locmem.EmailBackend):
+    """ Backend locmem qui compte les connexions créées et refuse certains destinataires. """
+    connexions = 0
+    refuses = set()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        BackendInstable.connexions += 1
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.refuses.intersection(message.to):
+                raise smtplib.SMTPRecipientsRefused({adresse: (550, b'refuse') for adresse in message.to})
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='accounts.tests.BackendInstable', EMAIL_OUTBOX_DELAI_BASE=60,
+                   EMAIL_OUTBOX_MAX_TENTATIVES=3)
+class EmailsSortantsTests(TestCase):
+    def setUp(self):
+        BackendInstable.connexions, BackendInstable.refuses = 0, set()
+
+    def test_contact_form_is_queued_then_sent_over_one_connection(self):
+        response = self.client.post(reverse('contact_form'), json.dumps({
+            'name': 'Amel', 'email': 'amel@test.tn', 'message': 'Bonjour',
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailSortant.objects.filter(statut=EmailSortant.EN_ATTENTE).count(), 2)
+
+        for i in range(30):
+            mettre_en_file(f'Sujet {i}', 'Corps', [f'dest{i}@test.tn'])
+        self.assertEqual(vider_file(taille_lot=50), (32, 0))
+        self.assertEqual(len(mail.outbox), 32)
+        self.assertEqual(BackendInstable.connexions, 1)
+        self.assertEqual(sorted(mail.outbox[1].to + mail.outbox[0].to), ['amel@test.tn', settings.DEFAULT_FROM_EMAIL])
+        self.assertEqual(vider_file(), (0, 0))
+
+    def test_failures_are_retried_with_backoff_then_abandoned(self):
+        BackendInstable.refuses = {'refuse@test.tn'}
+        refuse = mettre_en_file('A', 'Corps', ['refuse@test.tn'])
+        accepte = mettre_en_file('B', 'Corps', ['ok@test.tn'])
+
+        self.assertEqual(envoyer_lot(), (1, 1))
+        refuse.refresh_from_db()
+        self.assertEqual((refuse.statut, refuse.tentatives), (EmailSortant.EN_ATTENTE, 1))
+        self.assertIn('SMTPRecipientsRefused', refuse.derniere_erreur)
+        attente = refuse.prochain_essai - timezone.now()
+        self.assertTrue(timedelta(seconds=55) < attente <= timedelta(seconds=60))
+        self.assertEqual(envoyer_lot(), (0, 0))  # pas encore échu
+
+        delais = []
+        for _ in range(2):
+            EmailSortant.objects.filter(pk=refuse.pk).update(prochain_essai=timezone.now())
+            envoyer_lot()
+            refuse.refresh_from_db()
+            delais.append(refuse.prochain_essai - timezone.now())
+        self.assertTrue(timedelta(seconds=115) < delais[0] <= timedelta(seconds=120))
+        self.assertEqual((refuse.statut, refuse.tentatives), (EmailSortant.ECHEC, 3))
+
+        accepte.refresh_from_db()
+        self.assertEqual((accepte.statut, accepte.tentatives), (EmailSortant.ENVOYE, 1))
+        self.assertEqual([message.to for message in mail.outbox], [['ok@test.tn']])
+
+    def test_password_reset_request_is_queued(self):
+        get_user_model().objects.create_user(
+            email='oubli@test.tn', password='secret', nom='Oubli', prenom='Test',
+            telephone='0000', role='Proprietaire', adresse='Sfax',
+        )
+        response = self.client.post(reverse('password-reset'), {'email': 'oubli@test.tn'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        email = EmailSortant.objects.get()
+        self.assertEqual((email.destinataires, email.expediteur), (['oubli@test.tn'], settings.EMAIL_HOST_USER))
+        self.assertIn('reset?token=', email.corps)
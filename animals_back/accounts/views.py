@@ -7,7 +7,6 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
 import json
 
 from django.conf import settings
@@ -18,13 +17,16 @@ from allauth.socialaccount.providers.oauth2.client import OAuth2Client
 from dj_rest_auth.registration.views import SocialLoginView
 from .serializers import UserSerializer, MyTokenObtainPairSerializer
 from .models import Utilisateur,CustomAuthentication
+from .emails import mettre_en_file
+from .google import verifier_id_token
 from rest_framework_simplejwt.tokens import RefreshToken
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.contrib.auth.hashers import check_password, make_password
+from django.db import connection, transaction
+from django.db.models import Q
+from animals.pagination import PaginationInvalide, paginer_par_curseur, pagination_demandee
 
 
 
@@ -50,11 +52,8 @@ class MyTokenObtainPairView(TokenObtainPairView):
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-import requests
 import logging
 import time
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from django.conf import settings
 from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -81,9 +80,8 @@ class GoogleLoginView(APIView):
             
             # Verify the ID token with increased clock skew tolerance
             try:
-                idinfo = id_token.verify_oauth2_token(
+                idinfo = verifier_id_token(
                     id_token_str,
-                    google_requests.Request(),
                     settings.GOOGLE_CLIENT_ID,
                     clock_skew_in_seconds=30  # Allow up to 30 seconds of clock skew
                 )
@@ -165,18 +163,15 @@ def password_reset_request(request):
     token = default_token_generator.make_token(user)
     reset_link = f"http://localhost:3000/reset?token={token}&email={email}"
     
-    logger.info(f"Sending password reset email to {email} with link {reset_link}")
+    logger.info(f"Queueing password reset email to {email} with link {reset_link}")
     
-    try:
-        send_mail(
-            'Password Reset Request',
-            f'Click the link to reset your password: {reset_link}',
-            settings.EMAIL_HOST_USER,
-            [email],
-            fail_silently=False,
-        )
-    except Exception as e:
-        return Response({"error": f"Email sending failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    # Envoyé par la commande envoyer_emails (accounts/emails.py)
+    mettre_en_file(
+        'Password Reset Request',
+        f'Click the link to reset your password: {reset_link}',
+        [email],
+        expediteur=settings.EMAIL_HOST_USER,
+    )
 
     return Response({"message": "Check your email for the reset link"}, status=status.HTTP_200_OK)
 
@@ -264,12 +259,66 @@ def user_detail(request, pk):
     serializer = UserSerializer(user)
     return Response(serializer.data)
 
+# Colonnes exposées par l'annuaire (user_list ?fields=)
+CHAMPS_ANNUAIRE = ('id', 'nom', 'prenom', 'email', 'telephone', 'role', 'adresse', 'profilepicture')
+
+# Recherche : préfixe sur les trois colonnes (index trigramme sur UPPER(...)),
+# plus similarité trigramme sur les noms pour tolérer les fautes de frappe (PostgreSQL)
+CHAMPS_RECHERCHE_ANNUAIRE = ('nom', 'prenom', 'email')
+CHAMPS_TRIGRAMME_ANNUAIRE = ('nom', 'prenom')
+
+
+def _rechercher_utilisateurs(users, texte):
+    filtre = Q()
+    for champ in CHAMPS_RECHERCHE_ANNUAIRE:
+        filtre |= Q(**{f'{champ}__istartswith': texte})
+    if connection.vendor == 'postgresql':
+        for champ in CHAMPS_TRIGRAMME_ANNUAIRE:
+            filtre |= Q(**{f'{champ}__trigram_similar': texte})
+    return users.filter(filtre)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_list(request):
+    """
+    Annuaire : ?role=, ?search= (préfixe nom / prénom / email), ?fields=nom,email
+    (seules ces colonnes sont lues) et pagination par clé avec ?cursor= / ?page_size=.
+    """
     authentication_classes = [CustomAuthentication]
+    params = request.query_params
     users = Utilisateur.objects.all()
-    serializer = UserSerializer(users, many=True)
+
+    champs = None
+    if params.get('fields'):
+        champs = [champ.strip() for champ in params['fields'].split(',') if champ.strip()]
+        inconnus = [champ for champ in champs if champ not in CHAMPS_ANNUAIRE]
+        if inconnus:
+            return Response({'error': f"Champs inconnus : {', '.join(inconnus)}",
+                             'allowed': list(CHAMPS_ANNUAIRE)}, status=status.HTTP_400_BAD_REQUEST)
+        users = users.only('id', *champs)
+
+    role = params.get('role')
+    if role:
+        roles = [valeur for valeur, _ in Utilisateur._meta.get_field('role').choices]
+        if role not in roles:
+            return Response({'error': f"Rôle inconnu : {role}", 'allowed': roles},
+                            status=status.HTTP_400_BAD_REQUEST)
+        users = users.filter(role=role)
+
+    search = params.get('search', '').strip()
+    if search:
+        users = _rechercher_utilisateurs(users, search)
+
+    if pagination_demandee(params):
+        try:
+            users, next_cursor = paginer_par_curseur(users, params, ordre=('id',))
+        except PaginationInvalide as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = UserSerializer(users, many=True, champs=champs, context={'request': request})
+        return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
+    serializer = UserSerializer(users.order_by('id'), many=True, champs=champs)
     return Response(serializer.data)
 @api_view(['POST'])
 def contact_form(request):
@@ -289,7 +338,7 @@ def contact_form(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Send email
+        # Mis en file dans la même transaction, envoyés par la commande envoyer_emails
         subject = f'Nouvelle question de {name}'
         email_message = f"""
         Nom: {name}
@@ -299,18 +348,17 @@ def contact_form(request):
         {message}
         """
         
-        send_mail(
-            subject=subject,
-            message=email_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[settings.DEFAULT_FROM_EMAIL],  # Define this in settings.py
-            fail_silently=False,
-        )
-        
-        # Send confirmation email to user
-        send_mail(
-            subject='Nous avons bien reçu votre message',
-            message=f"""
+        with transaction.atomic():
+            mettre_en_file(
+                subject,
+                email_message,
+                [settings.DEFAULT_FROM_EMAIL],  # Define this in settings.py
+            )
+            
+            # Confirmation email to user
+            mettre_en_file(
+                'Nous avons bien reçu votre message',
+                f"""
             Bonjour {name},
             
             Nous avons bien reçu votre message et nous vous répondrons dans les plus brefs délais.
@@ -318,10 +366,8 @@ def contact_form(request):
             Cordialement,
             L'équipe du refuge
             """,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            fail_silently=False,
-        )
+                [email],
+            )
         
         return Response({'message': 'Message envoyé avec succès'}, status=status.HTTP_200_OK)
         
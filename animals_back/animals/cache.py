@@ -0,0 +1,119 @@
+# animals/cache.py
+import hashlib
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+_MANQUANT = object()
+
+# Verrous locaux (par hachage de clé) : un seul thread du processus reconstruit une clé donnée
+_VERROUS_LOCAUX = [threading.Lock() for _ in range(64)]
+
+
+def version(nom='catalogue'):
+    """
+    Compteur de version stocké dans le cache. La valeur initiale est horodatée
+    pour ne jamais réutiliser une ancienne version si la clé a été évincée.
+    """
+    cle = f'version:{nom}'
+    valeur = cache.get(cle)
+    if valeur is None:
+        cache.add(cle, time.time_ns(), timeout=None)
+        valeur = cache.get(cle, 0)
+    return valeur
+
+
+def incrementer_version(nom='catalogue'):
+    try:
+        cache.incr(f'version:{nom}')
+    except ValueError:
+        # Clé absente (jamais créée ou évincée)
+        cache.set(f'version:{nom}', time.time_ns(), timeout=None)
+
+
+def cle_reponse(nom, params=None, version_nom='catalogue'):
+    """ Clé de cache pour une réponse : endpoint + paramètres normalisés + version. """
+    normalises = []
+    if params is not None:
+        for cle in sorted(params.keys()):
+            valeurs = sorted(v.strip() for v in params.getlist(cle) if v.strip())
+            if valeurs:
+                normalises.append((cle, valeurs))
+    empreinte = hashlib.sha1(repr(normalises).encode()).hexdigest()
+    return f'reponse:{nom}:{version(version_nom)}:{empreinte}'
+
+
+def obtenir_ou_construire(cle, construire, timeout=None):
+    """
+    Renvoie la valeur en cache ou la construit. Protection single-flight :
+    sur un défaut de cache concurrent, un seul appelant exécute `construire`,
+    les autres attendent son résultat.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 300)
+    valeur = cache.get(cle, _MANQUANT)
+    if valeur is not _MANQUANT:
+        return valeur
+
+    attente = getattr(settings, 'CATALOGUE_CACHE_LOCK_TIMEOUT', 10)
+    with _VERROUS_LOCAUX[hash(cle) % len(_VERROUS_LOCAUX)]:
+        valeur = cache.get(cle, _MANQUANT)
+        if valeur is not _MANQUANT:
+            return valeur
+
+        # Verrou partagé entre processus (cache.add est atomique)
+        verrou = f'{cle}:verrou'
+        if cache.add(verrou, 1, timeout=attente):
+            try:
+                valeur = construire()
+                cache.set(cle, valeur, timeout)
+            finally:
+                cache.delete(verrou)
+            return valeur
+
+        # Un autre processus reconstruit : on attend son résultat
+        limite = time.monotonic() + attente
+        while time.monotonic() < limite:
+            time.sleep(0.05)
+            valeur = cache.get(cle, _MANQUANT)
+            if valeur is not _MANQUANT:
+                return valeur
+            if cache.get(verrou) is None:
+                break
+        return construire()
+
+
+def validateurs_http(model, prefixe, kwarg='pk', par_utilisateur=False):
+    """
+    Décorateur condition() : ETag / Last-Modified calculés depuis `updated_at`
+    (une seule requête indexée sur la clé primaire). Un If-None-Match ou
+    If-Modified-Since satisfait renvoie 304 sans exécuter la vue.
+    `par_utilisateur` pour les réponses propres à l'utilisateur et au jour
+    (statuts de demandes, âge affiché) : l'ETag en tient compte et
+    Last-Modified n'est pas utilisé.
+    """
+    attribut = f'_updated_at_{prefixe}'
+
+    def horodatage(request, *args, **kwargs):
+        if not hasattr(request, attribut):
+            setattr(request, attribut, model._default_manager.filter(
+                pk=kwargs[kwarg]
+            ).values_list('updated_at', flat=True).first())
+        return getattr(request, attribut)
+
+    def etag(request, *args, **kwargs):
+        updated_at = horodatage(request, *args, **kwargs)
+        if updated_at is None:
+            return None
+        parties = [prefixe, str(kwargs[kwarg]), str(updated_at.timestamp())]
+        if par_utilisateur:
+            parties += [str(request.user.pk), date.today().isoformat()]
+        return '-'.join(parties)
+
+    if par_utilisateur:
+        return condition(etag_func=etag)
+    return condition(etag_func=etag, last_modified_func=horodatage)
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:40
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def creer_index_recherche(apps, schema_editor):
+    # GIN indexes only exist on PostgreSQL; SQLite uses animals.search.MoteurIndexInverse
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS animals_animal_recherche_gin '
+        'ON animals_animal USING gin (recherche)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS animals_animal_nom_trgm '
+        'ON animals_animal USING gin (nom gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS animals_animal_race_trgm '
+        'ON animals_animal USING gin (race gin_trgm_ops)'
+    )
+    Animal = apps.get_model('animals', 'Animal')
+    Animal.objects.update(recherche=(
+        SearchVector('nom', weight='A', config='french')
+        + SearchVector('race', weight='B', config='french')
+        + SearchVector('description', weight='C', config='french')
+    ))
+
+
+def supprimer_index_recherche(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nom in ('animals_animal_recherche_gin', 'animals_animal_nom_trgm', 'animals_animal_race_trgm'):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nom}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0005_demandegarde_date_fin_demandegarde_date_reservation_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='animal',
+            name='recherche',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(creer_index_recherche, supprimer_index_recherche),
+    ]
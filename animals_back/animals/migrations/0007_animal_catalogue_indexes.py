@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-18 01:13
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0006_animal_recherche'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(django.db.models.functions.text.Lower('espece'), django.db.models.functions.text.Lower('race'), models.F('date_naissance'), condition=models.Q(('disponible_pour_adoption', True), ('type_garde', 'Définitive')), name='animal_catalogue_espece_race'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(django.db.models.functions.text.Lower('race'), condition=models.Q(('disponible_pour_adoption', True), ('type_garde', 'Définitive')), name='animal_catalogue_race'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(condition=models.Q(('disponible_pour_adoption', True), ('type_garde', 'Définitive')), fields=['date_naissance'], name='animal_catalogue_naissance'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(condition=models.Q(('disponible_pour_adoption', True), ('type_garde', 'Définitive')), fields=['date_creation', 'id'], name='animal_catalogue_creation'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0007_animal_catalogue_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
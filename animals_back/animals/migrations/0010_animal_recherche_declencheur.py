@@ -0,0 +1,47 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:10
+
+from django.db import migrations
+
+# Même vecteur que animals.Animal.CHAMPS_RECHERCHE (poids A à C), calculé par la base
+# à chaque écriture : les QuerySet.update() et bulk_create sont indexés aussi
+VECTEUR = (
+    "setweight(to_tsvector('french', coalesce(NEW.nom, '')), 'A')"
+    " || setweight(to_tsvector('french', coalesce(NEW.race, '')), 'B')"
+    " || setweight(to_tsvector('french', coalesce(NEW.description, '')), 'C')"
+)
+
+
+def creer_declencheur(apps, schema_editor):
+    # SQLite uses animals.search.MoteurIndexInverse
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE OR REPLACE FUNCTION animals_animal_recherche() RETURNS trigger AS $$ '
+        f'BEGIN NEW.recherche := {VECTEUR}; RETURN NEW; END '
+        '$$ LANGUAGE plpgsql'
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER animals_animal_recherche '
+        'BEFORE INSERT OR UPDATE OF nom, race, description ON animals_animal '
+        'FOR EACH ROW EXECUTE FUNCTION animals_animal_recherche()'
+    )
+    # Lignes modifiées sans post_save depuis 0006
+    schema_editor.execute('UPDATE animals_animal SET nom = nom')
+
+
+def supprimer_declencheur(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP TRIGGER IF EXISTS animals_animal_recherche ON animals_animal')
+    schema_editor.execute('DROP FUNCTION IF EXISTS animals_animal_recherche()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0009_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_declencheur, supprimer_declencheur),
+    ]
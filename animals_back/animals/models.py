@@ -1,8 +1,60 @@
 # animals/models.py
 from django.db import models
-from datetime import date
+from django.contrib.postgres.search import SearchVectorField
+from datetime import date, timedelta
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Lower
+
+# Conditions de l'index partiel du catalogue d'adoption
+CATALOGUE_ADOPTION = Q(disponible_pour_adoption=True, type_garde='Définitive')
+
+# Tranches d'âge du catalogue en années : (minimum inclus, maximum exclu)
+TRANCHES_AGE = {
+    'puppy': (None, 1),
+    'young': (1, 3),
+    'adult': (3, 8),
+    'senior': (8, None),
+}
+
+
+class AnimalQuerySet(models.QuerySet):
+    def adoptables(self):
+        return self.filter(CATALOGUE_ADOPTION)
+
+    def filtrer_catalogue(self, espece='', race='', sexe='', age=''):
+        """
+        Filtres du catalogue écrits pour correspondre aux index de Animal.Meta :
+        LOWER(espece) / LOWER(race) au lieu de iexact, et des bornes sur
+        date_naissance plutôt qu'un calcul d'âge par ligne.
+        """
+        queryset = self
+        if espece:
+            queryset = queryset.alias(espece_normalisee=Lower('espece')).filter(espece_normalisee=espece.lower())
+        if race:
+            queryset = queryset.alias(race_normalisee=Lower('race')).filter(race_normalisee=race.lower())
+        if sexe:
+            queryset = queryset.filter(sexe=sexe)
+        if age in TRANCHES_AGE:
+            age_min, age_max = TRANCHES_AGE[age]
+            today = date.today()
+            if age_min is not None:
+                queryset = queryset.filter(date_naissance__lte=today - timedelta(days=age_min * 365))
+            if age_max is not None:
+                queryset = queryset.filter(date_naissance__gt=today - timedelta(days=age_max * 365))
+        return queryset
+
+    def avec_utilisateur_nom(self):
+        """ Annote le nom du gardien actuel (dernière demande de garde acceptée). """
+        derniere_demande = DemandeGarde.objects.filter(
+            animal=OuterRef('pk'),
+            statut='Acceptee',
+        ).order_by('-date_demande')
+        return self.annotate(
+            utilisateur_nom_courant=Subquery(derniere_demande.values('utilisateur__nom')[:1])
+        )
+
 
 class Animal(models.Model):
     SEXE_CHOICES = [
@@ -22,6 +74,8 @@ class Animal(models.Model):
     sexe = models.CharField(max_length=1, choices=SEXE_CHOICES)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='animaux/', blank=True, null=True)
+    # Renditions redimensionnées de `image` (voir renditions.py)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     # Disponibilité
     disponible_pour_adoption = models.BooleanField(default=False)
@@ -36,6 +90,28 @@ class Animal(models.Model):
 
     # Dates et suivi
     date_creation = models.DateTimeField(auto_now_add=True)
+    # Aussi mis à jour quand une demande, adoption ou événement lié change (voir signals.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Recherche plein texte (maintenu par animals.search, voir signals.py)
+    recherche = SearchVectorField(null=True, editable=False)
+
+    objects = AnimalQuerySet.as_manager()
+
+    CHAMPS_RECHERCHE = {'nom': 'A', 'race': 'B', 'description': 'C'}
+    CHAMPS_TRIGRAMME = ('nom', 'race')
+
+    class Meta:
+        indexes = [
+            models.Index(
+                Lower('espece'), Lower('race'), F('date_naissance'),
+                name='animal_catalogue_espece_race',
+                condition=CATALOGUE_ADOPTION,
+            ),
+            models.Index(Lower('race'), name='animal_catalogue_race', condition=CATALOGUE_ADOPTION),
+            models.Index(fields=['date_naissance'], name='animal_catalogue_naissance', condition=CATALOGUE_ADOPTION),
+            models.Index(fields=['date_creation', 'id'], name='animal_catalogue_creation', condition=CATALOGUE_ADOPTION),
+        ]
 
     def __str__(self):
         return f"{self.nom} ({self.espece})"
@@ -72,6 +148,7 @@ class DemandeGarde(models.Model):
     message = models.TextField(blank=True, null=True)
     type_garde = models.CharField(max_length=20, choices=TYPE_GARDE_CHOICES, default='Temporaire') 
     image = models.ImageField(upload_to='animaux/', blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     date_reservation = models.DateField(blank=False, null=False)  # Change to NOT NULL
     date_fin = models.DateField(blank=False, null=False)  # Change to NOT NULL
 
@@ -120,6 +197,7 @@ class Garderie(models.Model):
     date_debut = models.DateField(auto_now_add=True)
     date_fin = models.DateField()
     image = models.ImageField(upload_to='animaux/', blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     type_garde = models.CharField(
         max_length=20, 
         choices=Animal.TYPE_GARDE_CHOICES,
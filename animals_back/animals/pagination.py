@@ -0,0 +1,115 @@
+# animals/pagination.py
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class PaginationInvalide(ValueError):
+    """ Curseur ou taille de page invalide dans les paramètres de la requête. """
+
+
+def pagination_demandee(params):
+    """ Les anciennes versions de l'application n'envoient ni `cursor` ni `page_size`. """
+    return 'cursor' in params or 'page_size' in params
+
+
+def _taille_page(params, taille_defaut):
+    taille_max = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 100)
+    if taille_defaut is None:
+        taille_defaut = getattr(settings, 'PAGINATION_PAGE_SIZE', 20)
+    taille = params.get('page_size')
+    if not taille:
+        return taille_defaut
+    try:
+        taille = int(taille)
+    except ValueError:
+        raise PaginationInvalide("page_size doit être un entier")
+    return max(1, min(taille, taille_max))
+
+
+def _encoder_valeur(valeur):
+    if isinstance(valeur, (datetime, date)):
+        return valeur.isoformat()
+    if isinstance(valeur, Decimal):
+        return str(valeur)
+    return valeur
+
+
+def encoder_curseur(valeurs):
+    brut = json.dumps([_encoder_valeur(v) for v in valeurs], separators=(',', ':'))
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(queryset, champs, jeton):
+    try:
+        brut = base64.urlsafe_b64decode(jeton + '=' * (-len(jeton) % 4))
+        valeurs = json.loads(brut)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise PaginationInvalide("Curseur invalide")
+    if not isinstance(valeurs, list) or len(valeurs) != len(champs):
+        raise PaginationInvalide("Curseur invalide")
+
+    decodees = []
+    for champ, valeur in zip(champs, valeurs):
+        try:
+            field = queryset.model._meta.get_field(champ)
+        except FieldDoesNotExist:
+            annotation = queryset.query.annotations.get(champ)
+            if annotation is None:
+                raise PaginationInvalide("Curseur invalide")
+            # Annotations (ex: pertinence, effective_price) use their output field
+            field = annotation.output_field
+        # Curseur forgé : seules des valeurs scalaires non nulles sont produites par
+        # encoder_curseur (None ne peut pas servir de borne dans _filtre_apres)
+        if valeur is None or isinstance(valeur, (list, dict)):
+            raise PaginationInvalide("Curseur invalide")
+        try:
+            decodees.append(field.to_python(valeur))
+        except (ValidationError, TypeError, ValueError):
+            raise PaginationInvalide("Curseur invalide")
+    return decodees
+
+
+def _filtre_apres(champs, valeurs, descendant):
+    """ Condition lexicographique (c1, c2, ...) > (v1, v2, ...) (ou < en ordre descendant). """
+    operateur = 'lt' if descendant else 'gt'
+    condition = Q()
+    for i, champ in enumerate(champs):
+        egalites = {champs[j]: valeurs[j] for j in range(i)}
+        condition |= Q(**egalites, **{f'{champ}__{operateur}': valeurs[i]})
+    return condition
+
+
+def paginer_par_curseur(queryset, params, ordre=('date_creation', 'id'), taille_defaut=None):
+    """
+    Pagination par clé (keyset) : chaque page repart de la dernière ligne vue,
+    donc une page profonde coûte autant que la première.
+    `ordre` liste des champs tous dans le même sens ('-' pour descendant),
+    le dernier devant être unique (id).
+    Retourne (objets, next_cursor).
+    """
+    descendant = ordre[0].startswith('-')
+    champs = [o.lstrip('-') for o in ordre]
+    if any(o.startswith('-') != descendant for o in ordre):
+        raise ValueError("Tous les champs de l'ordre doivent avoir le même sens")
+
+    taille = _taille_page(params, taille_defaut)
+    jeton = params.get('cursor')
+    queryset = queryset.order_by(*ordre)
+    if jeton:
+        valeurs = decoder_curseur(queryset, champs, jeton)
+        queryset = queryset.filter(_filtre_apres(champs, valeurs, descendant))
+
+    objets = list(queryset[:taille + 1])
+    next_cursor = None
+    if len(objets) > taille:
+        objets = objets[:taille]
+        dernier = objets[-1]
+        next_cursor = encoder_curseur([getattr(dernier, champ) for champ in champs])
+    return objets, next_cursor
@@ -0,0 +1,116 @@
+# animals/renditions.py
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import incrementer_version
+
+logger = logging.getLogger(__name__)
+
+# Largeur maximale (px) de chaque rendition ; l'original n'est jamais agrandi
+RENDITIONS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1280,
+}
+
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_pool = None
+_pool_verrou = threading.Lock()
+
+
+def _executeur():
+    global _pool
+    with _pool_verrou:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_RENDITION_WORKERS', 2),
+                thread_name_prefix='renditions',
+            )
+        return _pool
+
+
+def chemin_rendition(nom_image, nom, extension):
+    racine, _ = os.path.splitext(nom_image)
+    return f'renditions/{racine}_{nom}.{extension}'
+
+
+def generer_renditions(nom_image):
+    """
+    Génère les renditions WebP et JPEG de `nom_image` dans le stockage par défaut.
+    Les fichiers déjà présents (image partagée entre Animal et DemandeGarde) sont réutilisés.
+    """
+    with default_storage.open(nom_image, 'rb') as fichier:
+        original = ImageOps.exif_transpose(Image.open(fichier))
+        original = original.convert('RGB')
+
+    renditions = {'source': nom_image}
+    for nom, largeur_max in RENDITIONS.items():
+        image = original.copy()
+        if image.width > largeur_max:
+            image.thumbnail((largeur_max, largeur_max * 10), Image.LANCZOS)
+        rendition = {'width': image.width, 'height': image.height}
+        for format_nom, (format_pil, extension, options) in FORMATS.items():
+            chemin = chemin_rendition(nom_image, nom, extension)
+            if not default_storage.exists(chemin):
+                tampon = BytesIO()
+                image.save(tampon, format_pil, **options)
+                chemin = default_storage.save(chemin, ContentFile(tampon.getvalue()))
+            rendition[format_nom] = chemin
+        renditions[nom] = rendition
+    return renditions
+
+
+def _traiter(label, pk, nom_image):
+    try:
+        model = apps.get_model(label)
+        renditions = generer_renditions(nom_image)
+        champs = {'renditions': renditions}
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            champs['updated_at'] = timezone.now()
+        # Filtre sur l'image : ignore le résultat si elle a été remplacée entre-temps
+        model._default_manager.filter(pk=pk, image=nom_image).update(**champs)
+        incrementer_version('catalogue')
+    except Exception:
+        logger.exception("Échec de génération des renditions pour %s #%s (%s)", label, pk, nom_image)
+    finally:
+        connection.close()
+
+
+def planifier_renditions(instance):
+    """ Met en file la génération des renditions après la validation de la transaction. """
+    nom_image = instance.image.name if instance.image else None
+    if not nom_image or (instance.renditions or {}).get('source') == nom_image:
+        return
+    label, pk = instance._meta.label, instance.pk
+    transaction.on_commit(lambda: _executeur().submit(_traiter, label, pk, nom_image))
+
+
+def srcset(instance):
+    """ {'thumbnail': {'width', 'height', 'webp', 'jpeg'}, ...} en URLs, ou None si pas encore générées. """
+    renditions = instance.renditions or {}
+    if not instance.image or renditions.get('source') != instance.image.name:
+        return None
+    return {
+        nom: {
+            'width': renditions[nom]['width'],
+            'height': renditions[nom]['height'],
+            **{fmt: f"{settings.MEDIA_URL}{renditions[nom][fmt]}" for fmt in FORMATS},
+        }
+        for nom in RENDITIONS
+        if nom in renditions
+    }
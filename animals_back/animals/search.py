@@ -0,0 +1,196 @@
+# animals/search.py
+import difflib
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Max, Q, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+
+class MoteurRecherche:
+    """
+    Recherche plein texte classée par pertinence.
+    `rechercher` filtre le queryset reçu (les autres filtres sont donc conservés)
+    et l'annote d'un champ `pertinence`.
+    """
+
+    def __init__(self, champs_ponderes, champs_trigramme=('nom',)):
+        # {champ: poids} ; poids 'A' (le plus fort) à 'D' comme pour setweight()
+        self.champs_ponderes = champs_ponderes
+        self.champs_trigramme = champs_trigramme
+
+    def rechercher(self, queryset, texte):
+        raise NotImplementedError
+
+    def indexer(self, instance):
+        """ Appelé après l'enregistrement d'une instance. """
+
+    def desindexer(self, instance):
+        """ Appelé après la suppression d'une instance. """
+
+
+class MoteurPostgres(MoteurRecherche):
+    """
+    Colonne `recherche` (tsvector) indexée en GIN, complétée par la similarité
+    pg_trgm sur les mots des champs courts pour tolérer les fautes de frappe.
+    La colonne est calculée par un déclencheur BEFORE INSERT OR UPDATE
+    (migrations animals 0010, boutique 0011) : save(), update() et bulk_create
+    la tiennent à jour sans passer par indexer().
+    """
+    config = 'french'
+    champ_vecteur = 'recherche'
+
+    def rechercher(self, queryset, texte):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+
+        requete = SearchQuery(texte, config=self.config, search_type='websearch')
+        filtre = Q(**{self.champ_vecteur: requete})
+        # NULL (colonne ou champ vide) ferait une pertinence NULL, inutilisable comme curseur
+        pertinence = Coalesce(SearchRank(F(self.champ_vecteur), requete), Value(0.0))
+        for champ in self.champs_trigramme:
+            # `%>` : `texte` proche d'un mot du champ ('bergr' / 'Berger allemand'),
+            # utilise l'index gin_trgm_ops
+            filtre |= Q(**{f'{champ}__trigram_word_similar': texte})
+            pertinence = pertinence + Coalesce(TrigramWordSimilarity(texte, champ), Value(0.0))
+        # ts_rank et word_similarity sont des `real` : en double precision, la valeur
+        # relue dans le curseur se compare exactement (pagination sur -pertinence, -id)
+        return queryset.filter(filtre).annotate(pertinence=Cast(pertinence, FloatField()))
+
+
+POIDS_INDEX_INVERSE = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+
+def _termes(texte):
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+    return [t for t in re.split(r'\W+', texte) if len(t) > 1]
+
+
+class MoteurIndexInverse(MoteurRecherche):
+    """
+    Repli pour SQLite : index inversé construit en mémoire à la première
+    recherche et tenu à jour par les signaux post_save / post_delete.
+    Il est reconstruit si la table a changé sans signal dans ce processus
+    (bulk_create, rollback, autre processus, QuerySet.update() qui pose updated_at).
+    """
+    seuil_approche = 0.75
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._verrou = threading.Lock()
+        self._index = None  # terme -> {pk: poids}
+        self._documents = {}  # pk -> {terme: poids}
+        self._signature = None
+
+    def _documenter(self, instance_ou_valeurs):
+        termes = {}
+        for champ, poids in self.champs_ponderes.items():
+            for terme in _termes(instance_ou_valeurs[champ]):
+                termes[terme] = termes.get(terme, 0.0) + POIDS_INDEX_INVERSE[poids]
+        return termes
+
+    def _ajouter(self, pk, termes):
+        self._documents[pk] = termes
+        for terme, poids in termes.items():
+            self._index[terme][pk] = poids
+
+    def _retirer(self, pk):
+        for terme in self._documents.pop(pk, {}):
+            postings = self._index.get(terme)
+            if postings is not None:
+                postings.pop(pk, None)
+                if not postings:
+                    del self._index[terme]
+
+    def _signature_table(self, model):
+        """ Change à chaque écriture : nombre de lignes, dernier pk et dernière modification. """
+        agregats = {'nombre': Count('pk'), 'dernier': Max('pk')}
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            agregats['modifie'] = Max('updated_at')
+        return tuple(model._default_manager.aggregate(**agregats).values())
+
+    def _construire(self, model, signature):
+        self._index = defaultdict(dict)
+        self._documents = {}
+        champs = list(self.champs_ponderes)
+        for valeurs in model._default_manager.values('pk', *champs).iterator():
+            self._ajouter(valeurs['pk'], self._documenter(valeurs))
+        self._signature = signature
+
+    def _a_jour(self, model):
+        signature = self._signature_table(model)
+        if self._index is None or signature != self._signature:
+            self._construire(model, signature)
+
+    def _candidats(self, terme):
+        """ Termes de l'index correspondant à `terme`, avec un facteur de qualité. """
+        if terme in self._index:
+            yield terme, 1.0
+        if len(terme) >= 3:
+            for autre in self._index:
+                if autre != terme and autre.startswith(terme):
+                    yield autre, 0.8
+        for autre in difflib.get_close_matches(terme, self._index.keys(), n=3, cutoff=self.seuil_approche):
+            if autre != terme and not autre.startswith(terme):
+                yield autre, 0.5
+
+    def rechercher(self, queryset, texte):
+        termes = _termes(texte)
+        if not termes:
+            return queryset.none()
+
+        scores = defaultdict(float)
+        with self._verrou:
+            self._a_jour(queryset.model)
+            for terme in termes:
+                meilleurs = {}
+                for candidat, qualite in self._candidats(terme):
+                    for pk, poids in self._index[candidat].items():
+                        meilleurs[pk] = max(meilleurs.get(pk, 0.0), poids * qualite)
+                for pk, score in meilleurs.items():
+                    scores[pk] += score
+
+        if not scores:
+            return queryset.none()
+        # Tous les résultats sont classés (la pagination porte sur -pertinence, -id) ;
+        # une clause par score distinct, les scores étant des sommes de quelques poids
+        par_score = defaultdict(list)
+        for pk, score in scores.items():
+            par_score[score].append(pk)
+        pertinence = Case(
+            *[When(pk__in=pks, then=Value(score)) for score, pks in par_score.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        return queryset.annotate(pertinence=pertinence).filter(pertinence__gt=0)
+
+    def indexer(self, instance):
+        with self._verrou:
+            if self._index is None:
+                return
+            self._retirer(instance.pk)
+            valeurs = {champ: getattr(instance, champ) for champ in self.champs_ponderes}
+            self._ajouter(instance.pk, self._documenter(valeurs))
+            # L'enregistrement a changé la signature (updated_at, nombre de lignes)
+            self._signature = self._signature_table(type(instance))
+
+    def desindexer(self, instance):
+        with self._verrou:
+            if self._index is not None:
+                self._retirer(instance.pk)
+                self._signature = self._signature_table(type(instance))
+
+
+_moteurs = {}
+
+
+def moteur_pour(model):
+    """ Moteur adapté à la base courante pour un modèle déclarant CHAMPS_RECHERCHE. """
+    cle = (connection.vendor, model._meta.label)
+    if cle not in _moteurs:
+        classe = MoteurPostgres if connection.vendor == 'postgresql' else MoteurIndexInverse
+        _moteurs[cle] = classe(model.CHAMPS_RECHERCHE, getattr(model, 'CHAMPS_TRIGRAMME', ('nom',)))
+    return _moteurs[cle]
@@ -2,10 +2,12 @@
 from rest_framework import serializers
 from .models import Animal, DemandeEvenementMarche, DemandeGarde, DemandeAdoption, EvenementMarcheChien,Notification,Adoption
 from django.conf import settings
+from .renditions import srcset
 
 
 class AnimalSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     utilisateur_nom = serializers.SerializerMethodField()
 
     class Meta:
@@ -14,6 +16,8 @@ class AnimalSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
+        representation.pop('renditions', None)  # Exposed as image_srcset
+        representation.pop('recherche', None)  # tsvector interne (animals/search.py)
         if instance.image:
             representation['image'] = f"{settings.MEDIA_URL}{instance.image.name}"
         return representation
@@ -22,17 +26,21 @@ class AnimalSerializer(serializers.ModelSerializer):
         if obj.image:
             return f"{settings.MEDIA_URL}{obj.image.name}"
         return None
-        
-    def get_utilisateur_nom(self, obj):
-        # Get the latest accepted garde request for this animal
-        demande = obj.demandes_garde.filter(statut='Acceptee').order_by('-date_demande').first()
-        if demande:
-            return demande.utilisateur.nom
-        return None
 
+    def get_image_srcset(self, obj):
+        return srcset(obj)
+        
     def get_utilisateur_nom(self, obj):
+        # Use the annotation from Animal.objects.avec_utilisateur_nom() when present
+        if hasattr(obj, 'utilisateur_nom_courant'):
+            return obj.utilisateur_nom_courant
         # Get the latest accepted garde request for this animal
-        demande = obj.demandes_garde.filter(statut='Acceptee').order_by('-date_demande').first()
+        demande = (
+            obj.demandes_garde.filter(statut='Acceptee')
+            .select_related('utilisateur')
+            .order_by('-date_demande')
+            .first()
+        )
         if demande:
             return demande.utilisateur.nom
         return None
@@ -41,6 +49,7 @@ class AnimalSerializer(serializers.ModelSerializer):
 class DemandeGardeSerializer(serializers.ModelSerializer):
     image = serializers.ImageField(required=False, allow_null=True)
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = DemandeGarde
@@ -91,11 +100,19 @@ class DemandeGardeSerializer(serializers.ModelSerializer):
 
         return instance
 
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        representation.pop('renditions', None)  # Exposed as image_srcset
+        return representation
+
     def get_image_url(self, obj):
         if obj.image:
             return f"{settings.MEDIA_URL}{obj.image.name}"
         return None
 
+    def get_image_srcset(self, obj):
+        return srcset(obj)
+
 from rest_framework import serializers
 from .models import DemandeAdoption
 class AdoptionSerializer(serializers.ModelSerializer):
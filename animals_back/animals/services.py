@@ -0,0 +1,80 @@
+# animals/services.py
+from django.db import transaction
+
+from .models import DemandeEvenementMarche, EvenementMarcheChien
+
+MAX_CHIENS_PAR_DEMANDE = 3
+
+
+class InscriptionRefusee(Exception):
+    """ Demande d'inscription à une marche refusée ; `details` est ajouté à la réponse. """
+
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details
+
+
+def inscrire_chiens(utilisateur, evenement_id, chiens_ids):
+    """
+    Crée une DemandeEvenementMarche pour `chiens_ids` avec un nombre fixe de requêtes :
+    une pour l'appartenance des chiens à l'événement, une pour les conflits
+    et un seul INSERT groupé dans la table de liaison.
+    La ligne de l'événement est verrouillée (SELECT ... FOR UPDATE) pendant la
+    transaction : deux inscriptions concurrentes au même événement sont
+    sérialisées, la seconde voit donc la première comme un conflit.
+    """
+    try:
+        chiens_ids = list(dict.fromkeys(int(chien_id) for chien_id in chiens_ids))
+    except (TypeError, ValueError):
+        raise InscriptionRefusee('Identifiants de chiens invalides')
+
+    # Validate number of dogs
+    if not chiens_ids:
+        raise InscriptionRefusee('Veuillez sélectionner au moins un chien')
+    if len(chiens_ids) > MAX_CHIENS_PAR_DEMANDE:
+        raise InscriptionRefusee(f'Vous ne pouvez pas sélectionner plus de {MAX_CHIENS_PAR_DEMANDE} chiens')
+
+    Participation = EvenementMarcheChien.chiens.through
+    Inscription = DemandeEvenementMarche.chiens.through
+
+    with transaction.atomic():
+        try:
+            evenement = EvenementMarcheChien.objects.select_for_update().get(pk=evenement_id)
+        except (EvenementMarcheChien.DoesNotExist, ValueError, TypeError):
+            raise InscriptionRefusee('Événement non trouvé', status=404)
+
+        # Check if dogs are part of the event
+        presents = set(
+            Participation.objects.filter(evenementmarchechien_id=evenement.pk, animal_id__in=chiens_ids)
+            .values_list('animal_id', flat=True)
+        )
+        for chien_id in chiens_ids:
+            if chien_id not in presents:
+                raise InscriptionRefusee(f'Chien avec ID {chien_id} n\'est pas dans cet événement')
+
+        # Check if user already has requests for any of these dogs
+        conflicting_dogs = list(
+            Inscription.objects.filter(
+                demandeevenementmarche__utilisateur=utilisateur,
+                demandeevenementmarche__evenement=evenement,
+                animal_id__in=chiens_ids,
+            ).values_list('animal__nom', flat=True)
+        )
+        if conflicting_dogs:
+            raise InscriptionRefusee(
+                'Vous avez déjà une demande pour ces chiens: ' + ', '.join(conflicting_dogs),
+                conflicting_dogs=conflicting_dogs,
+            )
+
+        demande = DemandeEvenementMarche.objects.create(
+            utilisateur=utilisateur,
+            evenement=evenement,
+            statut='En attente'
+        )
+        Inscription.objects.bulk_create([
+            Inscription(demandeevenementmarche_id=demande.pk, animal_id=chien_id)
+            for chien_id in chiens_ids
+        ])
+    return demande
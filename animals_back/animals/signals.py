@@ -0,0 +1,82 @@
+# animals/signals.py
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import incrementer_version
+from .models import Adoption, Animal, DemandeAdoption, DemandeGarde, EvenementMarcheChien, Garderie
+from .renditions import planifier_renditions
+from .search import moteur_pour
+
+
+@receiver(post_save, sender=Animal)
+def indexer_animal(sender, instance, **kwargs):
+    moteur_pour(Animal).indexer(instance)
+
+
+@receiver(post_delete, sender=Animal)
+def desindexer_animal(sender, instance, **kwargs):
+    moteur_pour(Animal).desindexer(instance)
+
+
+@receiver([post_save, post_delete], sender=Animal)
+@receiver([post_save, post_delete], sender=DemandeGarde)
+@receiver([post_save, post_delete], sender=Adoption)
+def invalider_catalogue(sender, **kwargs):
+    # Les réponses en cache du catalogue sont indexées par cette version. Changée après
+    # le commit : un défaut de cache concurrent relirait sinon les anciennes lignes
+    # et les stockerait sous la nouvelle version.
+    transaction.on_commit(lambda: incrementer_version('catalogue'))
+
+
+@receiver(post_init, sender=settings.AUTH_USER_MODEL)
+def memoriser_nom_utilisateur(sender, instance, **kwargs):
+    instance._nom_initial = instance.__dict__.get('nom')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalider_catalogue_utilisateur(sender, instance, created, **kwargs):
+    # Les listes en cache affichent utilisateur_nom (gardien de l'animal)
+    nom = instance.__dict__.get('nom')  # champ différé (.only()) : non modifié
+    if not created and nom != instance._nom_initial:
+        invalider_catalogue(sender)
+    instance._nom_initial = nom
+
+
+def toucher_animaux(ids):
+    """ Les ETag / Last-Modified des fiches animal reposent sur Animal.updated_at. """
+    if ids:
+        Animal.objects.filter(pk__in=ids).update(updated_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=DemandeGarde)
+@receiver([post_save, post_delete], sender=DemandeAdoption)
+@receiver([post_save, post_delete], sender=Adoption)
+def toucher_animal_lie(sender, instance, **kwargs):
+    toucher_animaux([instance.animal_id])
+
+
+@receiver(post_save, sender=EvenementMarcheChien)
+def toucher_chiens_evenement(sender, instance, created, **kwargs):
+    if not created:
+        toucher_animaux(list(instance.chiens.values_list('pk', flat=True)))
+
+
+@receiver(m2m_changed, sender=EvenementMarcheChien.chiens.through)
+def toucher_chiens_modifies(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            toucher_animaux([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        toucher_animaux(pk_set)
+    elif action == 'pre_clear':
+        toucher_animaux(list(instance.chiens.values_list('pk', flat=True)))
+
+
+@receiver(post_save, sender=Animal)
+@receiver(post_save, sender=DemandeGarde)
+@receiver(post_save, sender=Garderie)
+def generer_renditions_image(sender, instance, **kwargs):
+    planifier_renditions(instance)
@@ -1,3 +1,464 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import obtenir_ou_construire
+from .models import Animal, DemandeAdoption, DemandeEvenementMarche, DemandeGarde, EvenementMarcheChien
+from .pagination import encoder_curseur
+from .renditions import generer_renditions, srcset
+from .services import InscriptionRefusee, inscrire_chiens
+
+
+class CatalogueQueryCountTests(TestCase):
+    NB_ANIMAUX = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.gardien = User.objects.create_user(
+            email='gardien@example.com', password='secret', nom='Gardien', prenom='Test',
+            telephone='0000', role='Proprietaire', adresse='Tunis',
+        )
+        Animal.objects.bulk_create([
+            Animal(
+                nom=f'Animal {i}', espece='Chien', race='Berger', date_naissance=date(2020, 1, 1),
+                sexe='M', disponible_pour_adoption=True, type_garde='Définitive',
+            )
+            for i in range(cls.NB_ANIMAUX)
+        ])
+        DemandeGarde.objects.bulk_create([
+            DemandeGarde(
+                animal=animal, utilisateur=cls.gardien, statut='Acceptee', type_garde='Définitive',
+                date_reservation=date(2024, 1, 1), date_fin=date(2024, 2, 1),
+            )
+            for animal in Animal.objects.all()[:100]
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_definitive_list_runs_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('admin-animal-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), self.NB_ANIMAUX)
+        noms = {animal['utilisateur_nom'] for animal in response.json()}
+        self.assertEqual(noms, {'Gardien', None})
+        self.assertNotIn('recherche', response.json()[0])
+
+    def test_search_runs_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('search_animals'), {'type': 'chien'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), self.NB_ANIMAUX)
+
+
+class CataloguePaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Animal.objects.bulk_create([
+            Animal(
+                nom=f'Animal {i}', espece='Chat', date_naissance=date(2021, 5, 1),
+                sexe='F', disponible_pour_adoption=True, type_garde='Définitive',
+            )
+            for i in range(45)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def parcourir(self, url, page_size):
+        ids, cursor = [], ''
+        while True:
+            params = {'page_size': page_size}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page['results']), page_size)
+            ids += [animal['id'] for animal in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_cursor_walks_every_animal_once(self):
+        attendus = list(Animal.objects.order_by('date_creation', 'id').values_list('id', flat=True))
+        for url in (reverse('admin-animal-list'), reverse('search_animals')):
+            self.assertEqual(self.parcourir(url, 10), attendus)
+
+    def test_unpaginated_response_kept_for_old_clients(self):
+        response = self.client.get(reverse('admin-animal-list'))
+        self.assertIsInstance(response.json(), list)
+        self.assertEqual(len(response.json()), 45)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('search_animals'), {'cursor': 'pas-un-curseur'})
+        self.assertEqual(response.status_code, 400)
+        # Curseurs décodables mais forgés (valeurs non scalaires, nulles ou de mauvais type)
+        for valeurs in ([[1], [2]], [{'a': 1}, 2], ['pas-une-date', 'x'], [None, 1], [1, None]):
+            jeton = encoder_curseur(valeurs)
+            for url in (reverse('admin-animal-list'), reverse('search_animals')):
+                self.assertEqual(self.client.get(url, {'cursor': jeton}).status_code, 400, (url, valeurs))
+
+
+class RechercheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        commun = dict(date_naissance=date(2022, 3, 1), disponible_pour_adoption=True, type_garde='Définitive')
+        cls.rex = Animal.objects.create(nom='Rex', espece='Chien', race='Berger allemand', sexe='M', **commun)
+        cls.luna = Animal.objects.create(
+            nom='Luna', espece='Chat', race='Siamois', sexe='F',
+            description='Adore jouer avec Rex', **commun,
+        )
+        Animal.objects.create(nom='Rex', espece='Chien', race='Berger', sexe='M', date_naissance=date(2022, 3, 1))
+
+    def setUp(self):
+        cache.clear()
+
+    def rechercher(self, **params):
+        response = self.client.get(reverse('search_animals'), params)
+        self.assertEqual(response.status_code, 200)
+        return [animal['id'] for animal in response.json()]
+
+    def test_ranked_by_relevance_across_fields(self):
+        self.assertEqual(self.rechercher(query='rex'), [self.rex.id, self.luna.id])
+        self.assertEqual(self.rechercher(query='siamois'), [self.luna.id])
+
+    def test_tolerates_typos(self):
+        self.assertEqual(self.rechercher(query='bergr'), [self.rex.id])
+
+    def test_other_filters_still_apply(self):
+        self.assertEqual(self.rechercher(query='rex', type='chat'), [self.luna.id])
+
+    def test_updates_without_signals_are_seen(self):
+        self.assertEqual(self.rechercher(query='rex'), [self.rex.id, self.luna.id])
+        # QuerySet.update() (ou un autre processus) : pas de post_save, updated_at change
+        Animal.objects.filter(pk=self.rex.pk).update(nom='Medor', updated_at=timezone.now())
+        cache.clear()  # la réponse en cache est indexée par la version catalogue, pas par l'index
+        self.assertEqual(self.rechercher(query='rex'), [self.luna.id])
+        self.assertEqual(self.rechercher(query='medor'), [self.rex.id])
+
+    def test_paginated_search_reaches_every_match(self):
+        Animal.objects.bulk_create([
+            Animal(nom=f'Rex {i}', espece='Chien', sexe='M', date_naissance=date(2022, 3, 1),
+                   disponible_pour_adoption=True, type_garde='Définitive')
+            for i in range(600)
+        ])
+        ids, cursor = [], ''
+        while True:
+            params = {'query': 'rex', 'page_size': 100}
+            if cursor:
+                params['cursor'] = cursor
+            page = self.client.get(reverse('search_animals'), params).json()
+            ids += [animal['id'] for animal in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(ids), 602)
+        self.assertEqual(len(set(ids)), 602)
+        self.assertEqual(ids[-1], self.luna.id)  # mention dans la description : moins pertinente
+
+
+@skipUnless(connection.vendor == 'postgresql', "EXPLAIN plans are checked on PostgreSQL only")
+class CatalogueIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Animal.objects.bulk_create([
+            Animal(
+                nom=f'Animal {i}', espece=('Chien', 'Chat')[i % 2], race=f'Race {i % 50}',
+                date_naissance=date(2010 + i % 14, 1 + i % 12, 1), sexe='MF'[i % 2],
+                disponible_pour_adoption=i % 3 == 0, type_garde=('Définitive', 'Temporaire')[i % 4 == 0],
+            )
+            for i in range(5000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE animals_animal')
+
+    def plan(self, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_espece_and_race_use_the_expression_index(self):
+        plan = self.plan(Animal.objects.adoptables().filtrer_catalogue(espece='CHIEN', race='race 4'))
+        self.assertIn('animal_catalogue_espece_race', plan)
+
+    def test_age_filter_uses_an_index(self):
+        plan = self.plan(Animal.objects.adoptables().filtrer_catalogue(age='senior'))
+        self.assertRegex(plan, 'animal_catalogue_(naissance|espece_race)')
+
+    def test_catalogue_order_uses_the_keyset_index(self):
+        plan = self.plan(Animal.objects.adoptables().order_by('date_creation', 'id')[:20])
+        self.assertIn('animal_catalogue_creation', plan)
+
+
+class CatalogueCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.animal = Animal.objects.create(
+            nom='Milo', espece='Chien', date_naissance=date(2020, 6, 1), sexe='M',
+            disponible_pour_adoption=True, type_garde='Définitive',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_requests_are_served_from_cache(self):
+        # The detail endpoint still reads updated_at for its ETag (one indexed query)
+        for url, requetes in ((reverse('admin-animal-list'), 0), (reverse('search_animals'), 0),
+                              (f'/api/animals/search/{self.animal.id}/', 1)):
+            premiere = self.client.get(url, {'type': 'chien'})
+            with self.assertNumQueries(requetes):
+                seconde = self.client.get(url, {'type': 'chien'})
+            self.assertEqual(premiere.json(), seconde.json())
+
+    def test_saving_an_animal_invalidates_the_catalogue(self):
+        self.client.get(reverse('admin-animal-list'))
+        with self.captureOnCommitCallbacks(execute=True) as rappels:
+            self.animal.nom = 'Milou'
+            self.animal.save()
+            # Version inchangée tant que la transaction n'est pas validée
+            self.assertEqual(self.client.get(reverse('admin-animal-list')).json()[0]['nom'], 'Milo')
+        self.assertTrue(rappels)
+        response = self.client.get(reverse('admin-animal-list'))
+        self.assertEqual(response.json()[0]['nom'], 'Milou')
+
+    def test_renaming_the_keeper_invalidates_the_catalogue(self):
+        gardien = get_user_model().objects.create_user(
+            email='gardien-cache@example.com', password='secret', nom='Gardien', prenom='Test',
+            telephone='0000', role='Proprietaire', adresse='Tunis',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            DemandeGarde.objects.create(
+                animal=self.animal, utilisateur=gardien, statut='Acceptee', type_garde='Définitive',
+                date_reservation=date(2024, 1, 1), date_fin=date(2024, 2, 1),
+            )
+        self.assertEqual(self.client.get(reverse('admin-animal-list')).json()[0]['utilisateur_nom'], 'Gardien')
+        with self.captureOnCommitCallbacks(execute=True):
+            gardien.nom = 'Gardienne'
+            gardien.save()
+        self.assertEqual(self.client.get(reverse('admin-animal-list')).json()[0]['utilisateur_nom'], 'Gardienne')
+
+    def test_concurrent_misses_rebuild_once(self):
+        appels = []
+
+        def construire():
+            appels.append(1)
+            time.sleep(0.2)
+            return 'valeur'
+
+        resultats = []
+        threads = [
+            threading.Thread(target=lambda: resultats.append(obtenir_ou_construire('test:single-flight', construire)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(appels), 1)
+        self.assertEqual(resultats, ['valeur'] * 8)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.animal = Animal.objects.create(
+            nom='Oscar', espece='Chat', date_naissance=date(2019, 2, 1), sexe='M',
+            disponible_pour_adoption=True, type_garde='Définitive',
+        )
+        cls.utilisateur = get_user_model().objects.create_user(
+            email='adoptant@example.com', password='secret', nom='Adoptant', prenom='Test',
+            telephone='0000', role='Proprietaire', adresse='Sfax',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = f'/api/animals/{self.animal.id}/'
+
+    def test_matching_etag_returns_304_without_serializing(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_related_garde_request_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        DemandeGarde.objects.create(
+            animal=self.animal, utilisateur=self.utilisateur, statut='Acceptee', type_garde='Définitive',
+            date_reservation=date(2024, 1, 1), date_fin=date(2024, 2, 1),
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['utilisateur_nom'], 'Adoptant')
+
+
+class RenditionsTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        reglages = override_settings(MEDIA_ROOT=self.media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+    def test_renditions_are_resized_and_exposed_as_srcset(self):
+        tampon = BytesIO()
+        Image.new('RGB', (2000, 1000), 'orange').save(tampon, 'JPEG')
+        nom = default_storage.save('animaux/photo.jpg', ContentFile(tampon.getvalue()))
+
+        renditions = generer_renditions(nom)
+        self.assertEqual(renditions['thumbnail']['width'], 160)
+        self.assertEqual(renditions['card']['width'], 480)
+        self.assertEqual(renditions['full']['height'], 640)
+        with default_storage.open(renditions['card']['webp']) as fichier:
+            self.assertEqual(Image.open(fichier).format, 'WEBP')
+
+        animal = Animal(nom='Flash', espece='Chien', date_naissance=date(2020, 1, 1), sexe='M',
+                        image=nom, renditions=renditions)
+        self.assertTrue(srcset(animal)['thumbnail']['jpeg'].endswith('photo_thumbnail.jpg'))
+        animal.image = 'animaux/autre.jpg'
+        self.assertIsNone(srcset(animal))
+
+
+class DossierBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = get_user_model().objects.create_user(
+            email='promeneur@example.com', password='secret', nom='Promeneur', prenom='Test',
+            telephone='0000', role='Promeneur', adresse='Sousse',
+        )
+        cls.animaux = [
+            Animal.objects.create(
+                nom=f'Chien {i}', espece='Chien', date_naissance=date(2018 + i, 1, 1), sexe='M',
+                disponible_pour_adoption=True, type_garde='Définitive',
+            )
+            for i in range(5)
+        ]
+        evenement = EvenementMarcheChien.objects.create(titre='Balade', date=date(2030, 1, 1), heure='10:00', lieu='Parc')
+        evenement.chiens.set(cls.animaux[:3])
+        DemandeAdoption.objects.create(animal=cls.animaux[0], utilisateur=cls.utilisateur)
+        DemandeGarde.objects.create(
+            animal=cls.animaux[1], utilisateur=cls.utilisateur, type_garde='Définitive',
+            date_reservation=date(2024, 1, 1), date_fin=date(2024, 2, 1),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.utilisateur)
+
+    def test_batch_uses_a_fixed_number_of_queries(self):
+        ids = ','.join(str(animal.id) for animal in reversed(self.animaux))
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('animal-dossiers'), {'ids': f'{ids},999999'})
+        self.assertEqual(response.status_code, 200)
+        dossiers = response.json()['results']
+        self.assertEqual([d['animal']['id'] for d in dossiers], [a.id for a in reversed(self.animaux)])
+        self.assertEqual(response.json()['not_found'], [999999])
+
+    def test_batch_matches_the_single_dossier(self):
+        response = self.client.get(reverse('animal-dossiers'), {'ids': f'{self.animaux[0].id},{self.animaux[1].id}'})
+        for dossier in response.json()['results']:
+            unique = self.client.get(reverse('animal-detail-view', args=[dossier['animal']['id']])).json()
+            self.assertEqual(dossier, unique)
+        self.assertEqual(response.json()['results'][0]['adoption_status'], 'En attente')
+        self.assertEqual(response.json()['results'][1]['garde_status'], 'En attente')
+        self.assertEqual(len(response.json()['results'][0]['evenements']), 1)
+
+
+def creer_marche(utilisateur_email):
+    utilisateur = get_user_model().objects.create_user(
+        email=utilisateur_email, password='secret', nom='Marcheur', prenom='Test',
+        telephone='0000', role='Promeneur', adresse='Bizerte',
+    )
+    chiens = [
+        Animal.objects.create(nom=f'Chien {i}', espece='Chien', date_naissance=date(2020, 1, 1), sexe='M')
+        for i in range(4)
+    ]
+    evenement = EvenementMarcheChien.objects.create(titre='Balade', date=date(2030, 1, 1), heure='10:00', lieu='Plage')
+    evenement.chiens.set(chiens[:3])
+    return utilisateur, chiens, evenement
+
+
+class InscriptionMarcheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur, cls.chiens, cls.evenement = creer_marche('marcheur@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.utilisateur)
+
+    def inscrire(self, chiens):
+        return self.client.post(
+            reverse('demande-marche-create'),
+            {'evenement': self.evenement.id, 'chiens': [chien.id for chien in chiens]},
+            format='json',
+        )
+
+    def test_registration_uses_a_fixed_number_of_queries(self):
+        # savepoint, lock event, membership, conflicts, insert demande, bulk insert of the links, release
+        with self.assertNumQueries(7):
+            inscrire_chiens(self.utilisateur, self.evenement.id, [c.id for c in self.chiens[:3]])
+        self.assertEqual(DemandeEvenementMarche.chiens.through.objects.count(), 3)
+
+    def test_conflicting_dogs_are_reported(self):
+        self.assertEqual(self.inscrire(self.chiens[:2]).status_code, 201)
+        response = self.inscrire(self.chiens[1:3])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['conflicting_dogs'], ['Chien 1'])
+
+    def test_dog_outside_the_event_is_rejected(self):
+        response = self.inscrire([self.chiens[3]])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DemandeEvenementMarche.objects.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', "Row locks need PostgreSQL")
+class InscriptionMarcheConcurrenceTests(TransactionTestCase):
+    def test_parallel_registrations_of_the_same_dogs(self):
+        utilisateur, chiens, evenement = creer_marche('concurrent@example.com')
+        ids = [chien.id for chien in chiens[:3]]
+        depart = threading.Barrier(8)
+        resultats = []
+
+        def inscrire():
+            try:
+                depart.wait()
+                inscrire_chiens(utilisateur, evenement.id, ids)
+                resultats.append('ok')
+            except InscriptionRefusee:
+                resultats.append('conflit')
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=inscrire) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(resultats), ['conflit'] * 7 + ['ok'])
+        self.assertEqual(DemandeEvenementMarche.objects.count(), 1)
+        self.assertEqual(DemandeEvenementMarche.chiens.through.objects.count(), 3)
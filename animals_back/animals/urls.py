@@ -1,6 +1,6 @@
 # animals/urls.py
 from django.urls import path
-from .views import AdoptedCountView, AnimalDetailedView, AnimalListCreateView, AnimalDetailView, DemandeEvenementMarcheCreateView, DemandeGardeListCreateView,AnimalAdminDefinitiveListView,AnimalDetailView,DemandeAdoptionAPIView, EvenementMarcheChienDetailsView, EvenementMarcheChienUserListView,NotificationView,NotificationMarkReadView, UserAcceptedAdoptionAnimalsView, UserAcceptedDefinitiveAnimalsView, UserAcceptedTemporaryAnimalsView, UserDemandesEvenementMarcheView,search_animals,get_animal_by_id
+from .views import AdoptedCountView, AnimalDetailedView, AnimalDossierBatchView, AnimalListCreateView, AnimalDetailView, DemandeEvenementMarcheCreateView, DemandeGardeListCreateView,AnimalAdminDefinitiveListView,AnimalDetailView,DemandeAdoptionAPIView, EvenementMarcheChienDetailsView, EvenementMarcheChienUserListView,NotificationView,NotificationMarkReadView, UserAcceptedAdoptionAnimalsView, UserAcceptedDefinitiveAnimalsView, UserAcceptedTemporaryAnimalsView, UserDemandesEvenementMarcheView,search_animals,get_animal_by_id
 
 from django.conf import settings
 from django.conf.urls.static import static
@@ -23,7 +23,7 @@ urlpatterns = [
     path('notifications/<int:pk>/read/', NotificationMarkReadView.as_view(), name='notification-mark-read'),
 
     path('search/', search_animals, name='search_animals'),
-    path('search/<int:pk>/', get_animal_by_id, name='search_animals'),
+    path('search/<int:animal_id>/', get_animal_by_id, name='search_animals'),
     #user informations
     path('mes-animaux-temporaire/', UserAcceptedTemporaryAnimalsView.as_view(), name='mes-animaux-temporaire'),
     path('mes-animaux-definitive/', UserAcceptedDefinitiveAnimalsView.as_view(), name='mes-animaux-definitive'),
@@ -36,6 +36,7 @@ urlpatterns = [
     path('user/demandes/marche-chiens/', UserDemandesEvenementMarcheView.as_view(), name='user-demandes-marche'),
   
     path('dog/detail/<int:pk>/', AnimalDetailedView.as_view(), name='animal-detail-view'),
+    path('dog/dossiers/', AnimalDossierBatchView.as_view(), name='animal-dossiers'),
 
     path('adopted-count/', AdoptedCountView.as_view(), name='adopted-count'
     ),
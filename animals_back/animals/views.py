@@ -8,10 +8,17 @@ from .serializers import AnimalSerializer, DemandeEvenementMarcheSerializer, Dem
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework import viewsets
-from django.db.models import Q
+from django.db.models import Prefetch
 from django.http import JsonResponse
+from django.utils.decorators import method_decorator
 from rest_framework import generics
 from rest_framework.permissions import AllowAny
+from django.conf import settings
+from .pagination import PaginationInvalide, pagination_demandee, paginer_par_curseur
+from .search import moteur_pour
+from .services import InscriptionRefusee, inscrire_chiens
+from .cache import cle_reponse, obtenir_ou_construire, validateurs_http
+from accounts.authentication import authentification_sans_requete
     
 
 
@@ -143,7 +150,7 @@ class AnimalAdminDefinitiveListView(APIView):
 
     def get(self, request):
         # List all animals in the system
-        animals = Animal.objects.filter(type_garde='Définitive',disponible_pour_adoption=True)  # Use the exact value from choices
+        animals = Animal.objects.avec_utilisateur_nom().adoptables()
         serializer = AnimalSerializer(animals, many=True)
         #print("test",serializer.data)  
         return Response(serializer.data)
@@ -151,7 +158,7 @@ class AnimalAdminDefinitiveListView(APIView):
 class AnimalDetailView(APIView):
     def get(self, request, pk):
         try:
-            animal = Animal.objects.get(pk=pk)
+            animal = Animal.objects.avec_utilisateur_nom().get(pk=pk)
             print("test", animal.image)
         except Animal.DoesNotExist:
             return Response({"error": "Animal not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -266,16 +273,28 @@ class AnimalAdminDefinitiveListView(APIView):
     parser_classes = [MultiPartParser, FormParser]  # Enable file parsing
 
     def get(self, request):
+        cle = cle_reponse('definitive', request.query_params)
+        try:
+            data = obtenir_ou_construire(cle, lambda: self.construire(request.query_params))
+        except PaginationInvalide as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+    def construire(self, params):
         # List all animals in the system
-        animals = Animal.objects.filter(type_garde='Définitive',disponible_pour_adoption=True)  # Use the exact value from choices
+        animals = Animal.objects.avec_utilisateur_nom().adoptables()
+        if pagination_demandee(params):
+            animals, next_cursor = paginer_par_curseur(animals, params)
+            serializer = AnimalSerializer(animals, many=True)
+            return {'results': serializer.data, 'next_cursor': next_cursor}
         serializer = AnimalSerializer(animals, many=True)
-        #print("test",serializer.data)  
-        return Response(serializer.data)
+        return serializer.data
 
 class AnimalDetailView(APIView):
+    @method_decorator(validateurs_http(Animal, 'animal'))
     def get(self, request, pk):
         try:
-            animal = Animal.objects.get(pk=pk)
+            animal = Animal.objects.avec_utilisateur_nom().get(pk=pk)
             print("test", animal.image)
         except Animal.DoesNotExist:
             return Response({"error": "Animal not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -297,9 +316,10 @@ class DemandeAdoptionAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class NotificationView(APIView):
+    authentication_classes = authentification_sans_requete()
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        notifications = Notification.objects.filter(utilisateur=request.user, lu=False)
+        notifications = Notification.objects.filter(utilisateur_id=request.user.id, lu=False)
         serializer = NotificationSerializer(notifications, many=True)
         return Response(serializer.data)
 class NotificationMarkReadView(APIView):
@@ -315,76 +335,64 @@ class NotificationMarkReadView(APIView):
             return Response({"error": "Notification not found"}, status=status.HTTP_404_NOT_FOUND)
         
 def search_animals(request):
-    query = request.GET.get('query', '')
-    animal_type = request.GET.get('type', '')
-    species = request.GET.get('species', '')
-    age = request.GET.get('age', '')
-    sexe = request.GET.get('sexe', '')
-
-    # Build the query
-    filters = Q()
+    cle = cle_reponse('search', request.GET)
+    try:
+        data = obtenir_ou_construire(cle, lambda: _construire_recherche(request.GET))
+    except PaginationInvalide as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(data, safe=False)
+
+def _construire_recherche(params):
+    query = params.get('query', '')
+    animal_type = params.get('type', '')
+    species = params.get('species', '')
+    age = params.get('age', '')
+    sexe = params.get('sexe', '')
+
+    # Fetch filtered animals (filters written to hit the catalogue indexes, see Animal.Meta)
+    animals = Animal.objects.avec_utilisateur_nom().adoptables().filtrer_catalogue(
+        espece=animal_type, race=species, sexe=sexe, age=age,
+    )
+    # Full-text search on nom/race/description, ranked by relevance
+    ordre = ('date_creation', 'id')
     if query:
-        filters &= Q(nom__icontains=query)
-    if animal_type:
-        filters &= Q(espece__iexact=animal_type)
-    if species:
-        filters &= Q(race__iexact=species)
-    if sexe:
-        filters &= Q(sexe=sexe)
-    if age:
-        # Age filtering logic - using date calculation
-        from datetime import date, timedelta
-        today = date.today()
-        
-        if age == 'puppy':  # Less than 1 year
-            date_limit = today - timedelta(days=365)
-            filters &= Q(date_naissance__gt=date_limit)
-        elif age == 'young':  # 1-3 years
-            date_min = today - timedelta(days=3*365)
-            date_max = today - timedelta(days=365)
-            filters &= Q(date_naissance__lte=date_max, date_naissance__gt=date_min)
-        elif age == 'adult':  # 3-8 years
-            date_min = today - timedelta(days=8*365)
-            date_max = today - timedelta(days=3*365)
-            filters &= Q(date_naissance__lte=date_max, date_naissance__gt=date_min)
-        elif age == 'senior':  # 8+ years
-            date_limit = today - timedelta(days=8*365)
-            filters &= Q(date_naissance__lte=date_limit)
-
-    # Fetch filtered animals
-    animals = Animal.objects.filter(filters, disponible_pour_adoption=True, type_garde='Définitive')
-    animals = AnimalSerializer(animals, many=True).data
-    return JsonResponse(list(animals), safe=False)
-
+        animals = moteur_pour(Animal).rechercher(animals, query)
+        ordre = ('-pertinence', '-id')
+    if pagination_demandee(params):
+        animals, next_cursor = paginer_par_curseur(animals, params, ordre=ordre)
+        return {'results': AnimalSerializer(animals, many=True).data, 'next_cursor': next_cursor}
+    return list(AnimalSerializer(animals.order_by(*ordre), many=True).data)
+
+@validateurs_http(Animal, 'animal', kwarg='animal_id')
 def get_animal_by_id(request, animal_id):
     """
     Get a single animal by ID
     """
-    try:
-        animal = get_object_or_404(Animal, id=animal_id, disponible_pour_adoption=True, type_garde='Définitive')
-        animal_data = AnimalSerializer(animal).data
-        return JsonResponse(animal_data)
-    except Animal.DoesNotExist:
-        return JsonResponse({'error': 'Animal not found'}, status=404)
+    def construire():
+        animal = get_object_or_404(Animal.objects.avec_utilisateur_nom().adoptables(), id=animal_id)
+        return AnimalSerializer(animal).data
+
+    animal_data = obtenir_ou_construire(cle_reponse(f'animal:{animal_id}'), construire)
+    return JsonResponse(animal_data)
 class UserAcceptedTemporaryAnimalsView(generics.ListAPIView):
     serializer_class = AnimalSerializer
+    authentication_classes = authentification_sans_requete()
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        return Animal.objects.filter(
-            garderie__utilisateur=user,
+        return Animal.objects.avec_utilisateur_nom().filter(
+            garderie__utilisateur_id=self.request.user.id,
             garderie__type_garde='Temporaire',
         ).distinct()
     
 class UserAcceptedDefinitiveAnimalsView(generics.ListAPIView):
     serializer_class = AnimalSerializer
+    authentication_classes = authentification_sans_requete()
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        return Animal.objects.filter(
-            garderie__utilisateur=user,
+        return Animal.objects.avec_utilisateur_nom().filter(
+            garderie__utilisateur_id=self.request.user.id,
             type_garde='Définitive'
         ).distinct()
 class UserAcceptedAdoptionAnimalsView(generics.ListAPIView):
@@ -394,7 +402,7 @@ class UserAcceptedAdoptionAnimalsView(generics.ListAPIView):
     def get_queryset(self):
         user = self.request.user
         # Get all animals that were adopted by the user via the Adoption model
-        return Animal.objects.filter(adoptions__utilisateur=user).distinct()
+        return Animal.objects.avec_utilisateur_nom().filter(adoptions__utilisateur=user).distinct()
 
 # views.py
 class EvenementMarcheChienUserListView(APIView):
@@ -438,124 +446,123 @@ class DemandeEvenementMarcheCreateView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
-        evenement_id = request.data.get('evenement')
-        chiens_ids = request.data.get('chiens', [])
-        
-        # Validate number of dogs
-        if not chiens_ids:
-            return Response({'error': 'Veuillez sélectionner au moins un chien'}, status=400)
-        
-        if len(chiens_ids) > 3:
-            return Response({'error': 'Vous ne pouvez pas sélectionner plus de 3 chiens'}, status=400)
-        
         try:
-            evenement = EvenementMarcheChien.objects.get(pk=evenement_id)
-            
-            # Check if dogs are part of the event
-            for chien_id in chiens_ids:
-                if not evenement.chiens.filter(id=chien_id).exists():
-                    return Response({'error': f'Chien avec ID {chien_id} n\'est pas dans cet événement'}, status=400)
-            
-            # Check if user already has requests for any of these dogs
-            existing_demandes = DemandeEvenementMarche.objects.filter(
-                utilisateur=request.user,
-                evenement=evenement,
-                chiens__id__in=chiens_ids
-            ).distinct()
-            
-            if existing_demandes.exists():
-                conflicting_dogs = []
-                for demande in existing_demandes:
-                    for chien in demande.chiens.filter(id__in=chiens_ids):
-                        conflicting_dogs.append(chien.nom)
-                
-                return Response({
-                    'error': 'Vous avez déjà une demande pour ces chiens: ' + ', '.join(conflicting_dogs),
-                    'conflicting_dogs': conflicting_dogs
-                }, status=400)
-            
-            # Create new request
-            demande = DemandeEvenementMarche.objects.create(
-                utilisateur=request.user,
-                evenement=evenement,
-                statut='En attente'
+            demande = inscrire_chiens(
+                request.user,
+                request.data.get('evenement'),
+                request.data.get('chiens', []),
             )
-            
-            for chien_id in chiens_ids:
-                chien = Animal.objects.get(id=chien_id)
-                demande.chiens.add(chien)
-    
-            serializer = DemandeEvenementMarcheSerializer(demande)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-            
-        except EvenementMarcheChien.DoesNotExist:
-            return Response({'error': 'Événement non trouvé'}, status=404)
+        except InscriptionRefusee as e:
+            return Response({'error': e.message, **e.details}, status=e.status)
         except Exception as e:
             return Response({'error': str(e)}, status=400)
+
+        serializer = DemandeEvenementMarcheSerializer(demande)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 class UserDemandesEvenementMarcheView(APIView):
+    authentication_classes = authentification_sans_requete()
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        demandes = DemandeEvenementMarche.objects.filter(utilisateur=request.user).order_by('-date_demande')
+        demandes = (
+            DemandeEvenementMarche.objects.filter(utilisateur_id=request.user.id)
+            .select_related('utilisateur', 'evenement')
+            .prefetch_related(Prefetch('chiens', queryset=Animal.objects.avec_utilisateur_nom()))
+            .order_by('-date_demande')
+        )
         serializer = DemandeEvenementMarcheSerializer(demandes, many=True)
         return Response(serializer.data)
 # Add this to your views.py
+def _queryset_dossiers(user):
+    """ Animals with everything a dossier needs, in a fixed number of queries (1 + 3 prefetches). """
+    return Animal.objects.avec_utilisateur_nom().prefetch_related(
+        Prefetch('evenements_marche', queryset=EvenementMarcheChien.objects.only('id', 'titre', 'date', 'lieu')),
+        Prefetch(
+            'demandes_adoption',
+            queryset=DemandeAdoption.objects.filter(utilisateur=user).order_by('pk'),
+            to_attr='mes_demandes_adoption',
+        ),
+        Prefetch(
+            'demandes_garde',
+            queryset=DemandeGarde.objects.filter(utilisateur=user).order_by('pk'),
+            to_attr='mes_demandes_garde',
+        ),
+    )
+
+def _age_display(dob):
+    # Calculate age in years and months
+    today = date.today()
+    age_years = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+    age_months = (today.month - dob.month) % 12
+    if today.day < dob.day:
+        age_months = (age_months - 1) % 12
+        
+    age_display = ""
+    if age_years > 0:
+        age_display += f"{age_years} an{'s' if age_years > 1 else ''}"
+        if age_months > 0:
+            age_display += f" et {age_months} mois"
+    else:
+        age_display = f"{age_months} mois"
+    return age_display
+
+def _dossier(animal):
+    """ Dossier of an animal fetched through _queryset_dossiers (no extra query). """
+    # Get dog participation in events
+    events_data = [
+        {
+            'id': event.id,
+            'titre': event.titre,
+            'date': str(event.date),  # Convert date to string for JSON
+            'lieu': event.lieu
+        }
+        for event in animal.evenements_marche.all()
+    ]
+
+    # Get adoption/garde status of the requesting user
+    adoption_status = animal.mes_demandes_adoption[0].statut if animal.mes_demandes_adoption else None
+    garde_status = animal.mes_demandes_garde[0].statut if animal.mes_demandes_garde else None
+
+    return {
+        'animal': AnimalSerializer(animal).data,
+        'evenements': events_data,
+        'adoption_status': adoption_status,
+        'garde_status': garde_status,
+        'age_display': _age_display(animal.date_naissance)
+    }
+
 class AnimalDetailedView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @method_decorator(validateurs_http(Animal, 'dossier', par_utilisateur=True))
     def get(self, request, pk):
+        animal = get_object_or_404(_queryset_dossiers(request.user), pk=pk)
+        return Response(_dossier(animal))
+
+class AnimalDossierBatchView(APIView):
+    """
+    Dossiers of several animals in one call: GET ?ids=1,2,3
+    Same structure as AnimalDetailedView for each animal, in the requested order.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
         try:
-            animal = get_object_or_404(Animal, pk=pk)
-            serializer = AnimalSerializer(animal)
-            
-            # Get dog participation in events
-            events_participated = animal.evenements_marche.all()
-            events_data = []
-            if events_participated:
-                for event in events_participated:
-                    events_data.append({
-                        'id': event.id,
-                        'titre': event.titre,
-                        'date': str(event.date),  # Convert date to string for JSON
-                        'lieu': event.lieu
-                    })
-            
-            # Get adoption/garde status
-            adoption_status = None
-            adoption_requests = animal.demandes_adoption.filter(utilisateur=request.user).first()
-            if adoption_requests:
-                adoption_status = adoption_requests.statut
-                
-            garde_status = None
-            garde_requests = animal.demandes_garde.filter(utilisateur=request.user).first()
-            if garde_requests:
-                garde_status = garde_requests.statut
-            
-            # Calculate age in years and months
-            today = date.today()
-            dob = animal.date_naissance
-            age_years = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-            age_months = (today.month - dob.month) % 12
-            if today.day < dob.day:
-                age_months = (age_months - 1) % 12
-                
-            age_display = ""
-            if age_years > 0:
-                age_display += f"{age_years} an{'s' if age_years > 1 else ''}"
-                if age_months > 0:
-                    age_display += f" et {age_months} mois"
-            else:
-                age_display = f"{age_months} mois"
-            
-            return Response({
-                'animal': serializer.data,
-                'evenements': events_data,
-                'adoption_status': adoption_status,
-                'garde_status': garde_status,
-                'age_display': age_display
-            })
-        except Animal.DoesNotExist:
-            return Response({'error': 'Animal not found'}, status=404)
+            ids = [int(i) for i in request.query_params.get('ids', '').split(',') if i.strip()]
+        except ValueError:
+            return Response({'error': 'ids doit être une liste d\'entiers séparés par des virgules'}, status=400)
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return Response({'error': 'Veuillez fournir au moins un identifiant'}, status=400)
+        maximum = getattr(settings, 'DOSSIER_BATCH_MAX', 50)
+        if len(ids) > maximum:
+            return Response({'error': f'Vous ne pouvez pas demander plus de {maximum} animaux'}, status=400)
+
+        animals = {animal.pk: animal for animal in _queryset_dossiers(request.user).filter(pk__in=ids)}
+        return Response({
+            'results': [_dossier(animals[pk]) for pk in ids if pk in animals],
+            'not_found': [pk for pk in ids if pk not in animals],
+        })
 class AdoptedCountView(APIView):
     """
     Returns the total number of adopted animals, based on entries in the Adoption table.
@@ -47,12 +47,19 @@ GOOGLE_CALLBACK_URL = "http://localhost:3000/google/callback/"
 ALLOWED_HOSTS = ['*']
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
         
     ),
 }
+# Keyset pagination (animals/pagination.py), enabled by ?cursor= / ?page_size=
+PAGINATION_PAGE_SIZE = 20
+PAGINATION_MAX_PAGE_SIZE = 100
+
+# Maximum number of animals per call to animals/dog/dossiers/
+DOSSIER_BATCH_MAX = 50
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
@@ -74,6 +81,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework.authtoken', 
@@ -176,6 +184,42 @@ DATABASES = {
 }
 
 
+# Cache
+# LocMem by default; set CACHE_BACKEND / CACHE_LOCATION to a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) in production.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'animals-back'),
+    }
+}
+
+# Public animal catalogue responses (animals/cache.py)
+CATALOGUE_CACHE_TIMEOUT = 300
+CATALOGUE_CACHE_LOCK_TIMEOUT = 10
+
+# Authenticated user cache (accounts/authentication.py), in seconds
+AUTH_USER_CACHE_TTL = 60
+
+# Transactional email outbox (accounts/emails.py, command envoyer_emails)
+EMAIL_OUTBOX_MAX_TENTATIVES = 5
+EMAIL_OUTBOX_DELAI_BASE = 60
+EMAIL_OUTBOX_DELAI_MAX = 3600
+
+
+# Image renditions (animals/renditions.py)
+IMAGE_RENDITION_WORKERS = 2
+
+# Cart stock holds (boutique/services.py), in seconds
+BOUTIQUE_RESERVATION_TTL = 15 * 60
+
+# "Frequently bought together" neighbours kept per product (boutique/associations.py)
+BOUTIQUE_ASSOCIES_TOP_K = 10
+
+# Price bands for the shop grid facets, [min, max) on the current price (boutique/facettes.py)
+BOUTIQUE_TRANCHES_PRIX = ((0, 10), (10, 25), (25, 50), (50, None))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
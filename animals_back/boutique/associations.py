@@ -0,0 +1,155 @@
+# boutique/associations.py
+import heapq
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import combinations_with_replacement, takewhile
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ArticlesCommande, CoAchat, Commande, Compteur, ProduitAssocie
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # comptage en Python pur
+    np = sparse = None
+
+# Ligne de Compteur mémorisant la dernière commande comptée
+FILIGRANE = 'associations:derniere_commande'
+
+# Une commande plus récente peut encore être en cours de validation (ids non monotones au commit)
+MARGE_VALIDATION = timedelta(minutes=5)
+
+
+def compter_paires(lignes):
+    """
+    `lignes` : couples (commande_id, produit_id). Renvoie {(a, b): nombre} pour a <= b,
+    soit le triangle supérieur de XᵀX où X est la matrice creuse commandes × produits.
+    """
+    if not lignes:
+        return {}
+    if sparse is None:
+        paniers = defaultdict(set)
+        for commande_id, produit_id in lignes:
+            paniers[commande_id].add(produit_id)
+        compte = Counter()
+        for produits in paniers.values():
+            compte.update(combinations_with_replacement(sorted(produits), 2))
+        return dict(compte)
+
+    tableau = np.asarray(lignes, dtype=np.int64)
+    commandes, lignes_x = np.unique(tableau[:, 0], return_inverse=True)
+    produits, colonnes_x = np.unique(tableau[:, 1], return_inverse=True)
+    x = sparse.csr_matrix(
+        (np.ones(len(tableau), dtype=np.int32), (lignes_x, colonnes_x)),
+        shape=(len(commandes), len(produits)),
+    )
+    x.data[:] = 1  # un produit présent deux fois dans une commande ne compte qu'une fois
+    cooccurrences = sparse.triu(x.T @ x).tocoo()
+    return {
+        (int(produits[a]), int(produits[b])): int(nombre)
+        for a, b, nombre in zip(cooccurrences.row, cooccurrences.col, cooccurrences.data)
+    }
+
+
+def _cumuler_paires(paires):
+    """ Ajoute `paires` à CoAchat (le job est sérialisé par le verrou du filigrane). """
+    existantes = {
+        (coachat.produit_a_id, coachat.produit_b_id): coachat
+        for coachat in CoAchat.objects.filter(
+            produit_a_id__in={a for a, _ in paires}, produit_b_id__in={b for _, b in paires}
+        )
+    }
+    a_creer, a_modifier = [], []
+    for (a, b), nombre in paires.items():
+        coachat = existantes.get((a, b))
+        if coachat is None:
+            a_creer.append(CoAchat(produit_a_id=a, produit_b_id=b, nombre=nombre))
+        else:
+            coachat.nombre += nombre
+            a_modifier.append(coachat)
+    CoAchat.objects.bulk_create(a_creer, batch_size=1000)
+    CoAchat.objects.bulk_update(a_modifier, ['nombre'], batch_size=1000)
+
+
+def recalculer_top(produit_ids, top_k=None):
+    """
+    Remplace la liste ProduitAssocie de chaque produit de `produit_ids`.
+    Score : similarité cosinus n(a,b) / √(n(a)·n(b)), qui évite que les produits
+    présents dans toutes les commandes soient recommandés partout.
+    """
+    top_k = top_k or getattr(settings, 'BOUTIQUE_ASSOCIES_TOP_K', 10)
+    produit_ids = set(produit_ids)
+    voisins = defaultdict(dict)
+    for a, b, nombre in CoAchat.objects.filter(
+        Q(produit_a_id__in=produit_ids) | Q(produit_b_id__in=produit_ids)
+    ).values_list('produit_a_id', 'produit_b_id', 'nombre').iterator():
+        voisins[a][b] = voisins[b][a] = nombre
+
+    concernes = produit_ids.union(*(voisins[produit_id].keys() for produit_id in produit_ids))
+    frequences = dict(
+        CoAchat.objects.filter(produit_a_id__in=concernes, produit_a=F('produit_b'))
+        .values_list('produit_a_id', 'nombre')
+    )
+
+    associes = []
+    for produit_id in produit_ids:
+        n_produit = frequences.get(produit_id)
+        if not n_produit:
+            continue
+        candidats = [
+            (nombre / math.sqrt(n_produit * frequences[autre]), nombre, autre)
+            for autre, nombre in voisins[produit_id].items()
+            if autre != produit_id and frequences.get(autre)
+        ]
+        for rang, (score, nombre, autre) in enumerate(heapq.nlargest(top_k, candidats), start=1):
+            associes.append(ProduitAssocie(produit_id=produit_id, associe_id=autre, rang=rang,
+                                           score=score, nombre=nombre))
+
+    ProduitAssocie.objects.filter(produit_id__in=produit_ids).delete()
+    ProduitAssocie.objects.bulk_create(associes, batch_size=1000)
+
+
+def calculer_associations(taille_lot=1000, complet=False, top_k=None, progression=None):
+    """
+    Compte les paires des commandes pas encore traitées (filigrane dans Compteur),
+    par lots de `taille_lot` commandes, puis recalcule le top-K des produits concernés.
+    `complet` repart de zéro. Le filigrane est verrouillé pendant chaque lot :
+    deux exécutions simultanées ne comptent jamais la même commande.
+    Les listes des voisins d'un produit concerné ne sont rafraîchies qu'au
+    prochain lot qui les touche (ou par un passage complet).
+    """
+    if complet:
+        with transaction.atomic():
+            CoAchat.objects.all().delete()
+            ProduitAssocie.objects.all().delete()
+            Compteur.objects.update_or_create(nom=FILIGRANE, defaults={'valeur': 0})
+
+    traitees = 0
+    while True:
+        with transaction.atomic():
+            Compteur.objects.get_or_create(nom=FILIGRANE)
+            filigrane = Compteur.objects.select_for_update().get(nom=FILIGRANE)
+            limite = timezone.now() - MARGE_VALIDATION
+            commandes = Commande.objects.filter(id__gt=filigrane.valeur).order_by('id').values_list(
+                'id', 'date_commande'
+            )[:taille_lot]
+            # On s'arrête à la première commande trop récente : le filigrane ne la dépasse pas
+            ids = [commande_id for commande_id, _ in takewhile(lambda c: c[1] <= limite, commandes)]
+            if not ids:
+                return traitees
+            lignes = list(
+                ArticlesCommande.objects.filter(commande_id__in=ids).values_list('commande_id', 'produit_id')
+            )
+            paires = compter_paires(lignes)
+            _cumuler_paires(paires)
+            recalculer_top({produit_id for _, produit_id in lignes}, top_k)
+            filigrane.valeur = ids[-1]
+            filigrane.save(update_fields=['valeur'])
+        traitees += len(ids)
+        if progression:
+            progression(traitees)
@@ -0,0 +1,79 @@
+# boutique/facettes.py
+from django.conf import settings
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from .models import Produit
+
+# Bornes [min, max[ sur prix_courant ; None = pas de borne supérieure
+TRANCHES_PRIX_DEFAUT = ((0, 10), (10, 25), (25, 50), (50, None))
+
+FACETTES = ('categorie', 'tranche_prix', 'en_promotion')
+
+
+def tranches_prix():
+    """ {'0-10': (0, 10), ..., '50+': (50, None)} """
+    tranches = getattr(settings, 'BOUTIQUE_TRANCHES_PRIX', TRANCHES_PRIX_DEFAUT)
+    return {
+        (f'{minimum}-{maximum}' if maximum is not None else f'{minimum}+'): (minimum, maximum)
+        for minimum, maximum in tranches
+    }
+
+
+def condition_tranche(cle):
+    minimum, maximum = tranches_prix()[cle]
+    condition = Q(prix_courant__gte=minimum)
+    if maximum is not None:
+        condition &= Q(prix_courant__lt=maximum)
+    return condition
+
+
+def expression_tranche():
+    return Case(
+        *[When(condition_tranche(cle), then=Value(cle)) for cle in tranches_prix()],
+        default=Value(None),
+        output_field=CharField(),
+    )
+
+
+def compter_facettes(queryset, filtres):
+    """
+    Comptes par catégorie, tranche de prix et promotion en une seule requête groupée
+    sur les trois dimensions. `queryset` porte les filtres hors facettes (recherche...),
+    `filtres` ({facette: valeur}) les filtres de facettes : chaque facette est comptée
+    avec les filtres des deux autres, comme dans une grille à filtres cumulables.
+    """
+    combinaisons = (
+        queryset.annotate(tranche_prix=expression_tranche())
+        .values(*FACETTES)
+        .annotate(nombre=Count('id'))
+        .order_by()
+    )
+    comptes = {
+        'categorie': dict.fromkeys((valeur for valeur, _ in Produit.CATEGORIES), 0),
+        'tranche_prix': dict.fromkeys(tranches_prix(), 0),
+        'en_promotion': {True: 0, False: 0},
+    }
+    total = 0
+
+    def retenue(combinaison, sauf=None):
+        return all(
+            combinaison[facette] == valeur
+            for facette, valeur in filtres.items()
+            if facette != sauf
+        )
+
+    for combinaison in combinaisons:
+        if retenue(combinaison):
+            total += combinaison['nombre']
+        for facette in FACETTES:
+            valeur = combinaison[facette]
+            if valeur is not None and retenue(combinaison, sauf=facette):
+                comptes[facette][valeur] = comptes[facette].get(valeur, 0) + combinaison['nombre']
+
+    return {
+        'total': total,
+        'facettes': {
+            facette: [{'valeur': valeur, 'nombre': nombre} for valeur, nombre in valeurs.items()]
+            for facette, valeurs in comptes.items()
+        },
+    }
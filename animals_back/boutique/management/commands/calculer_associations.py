@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from boutique.associations import calculer_associations, sparse
+
+
+class Command(BaseCommand):
+    help = "Met à jour les produits « souvent achetés ensemble » à partir des nouvelles commandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--complet', action='store_true', help="Recalcule depuis tout l'historique")
+        parser.add_argument('--taille-lot', type=int, default=1000, help="Commandes traitées par transaction")
+        parser.add_argument('--top-k', type=int, default=None, help="Produits associés conservés par produit")
+
+    def handle(self, *args, **options):
+        if sparse is None:
+            self.stdout.write("SciPy indisponible : comptage en Python pur")
+        total = calculer_associations(
+            taille_lot=options['taille_lot'],
+            complet=options['complet'],
+            top_k=options['top_k'],
+            progression=lambda traitees: self.stdout.write(f"{traitees} commande(s) traitée(s)"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"{total} commande(s) prise(s) en compte"))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from boutique.promotions import appliquer_promotions, prochaine_echeance
+
+
+class Command(BaseCommand):
+    help = "Active et expire les promotions à leurs bornes (prix_courant / en_promotion)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boucle', action='store_true',
+                            help="Tourne en continu et se réveille à la prochaine borne")
+        parser.add_argument('--intervalle', type=int, default=60,
+                            help="Attente maximale entre deux passages en mode boucle (secondes)")
+        parser.add_argument('--complet', action='store_true',
+                            help="Recalcule aussi les prix modifiés par QuerySet.update()")
+
+    def handle(self, *args, **options):
+        complet = options['complet']
+        while True:
+            ids = appliquer_promotions(complet=complet)
+            if ids or options['verbosity'] > 1:
+                self.stdout.write(f"{len(ids)} produit(s) mis à jour")
+            if not options['boucle']:
+                return
+            complet = False
+
+            attente = options['intervalle']
+            echeance = prochaine_echeance()
+            if echeance is not None:
+                # Une fin de promotion est franchie juste après discount_end_date
+                attente = min(attente, max(1, (echeance - timezone.now()).total_seconds() + 1))
+            connection.close()
+            time.sleep(attente)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from boutique.services import purger_reservations
+
+
+class Command(BaseCommand):
+    help = "Supprime les réservations de stock expirées (à planifier, ex: toutes les 5 minutes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        total = purger_reservations(taille_lot=options['taille_lot'])
+        self.stdout.write(f"{total} réservation(s) expirée(s) supprimée(s)")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from boutique.ventes import reconstruire
+
+
+class Command(BaseCommand):
+    help = "Recalcule les ventes journalières (VenteJournaliere) depuis l'historique des commandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=1000, help="Commandes traitées par transaction")
+
+    def handle(self, *args, **options):
+        total = reconstruire(
+            taille_lot=options['taille_lot'],
+            progression=lambda traitees: self.stdout.write(f"{traitees} commande(s) traitée(s)"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Ventes reconstruites à partir de {total} commande(s)"))
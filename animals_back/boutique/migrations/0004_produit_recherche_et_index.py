@@ -0,0 +1,70 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:05
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def creer_index_recherche(apps, schema_editor):
+    # GIN indexes only exist on PostgreSQL; SQLite uses animals.search.MoteurIndexInverse
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS boutique_produit_recherche_gin '
+        'ON boutique_produit USING gin (recherche)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS boutique_produit_nom_trgm '
+        'ON boutique_produit USING gin (nom gin_trgm_ops)'
+    )
+    Produit = apps.get_model('boutique', 'Produit')
+    Produit.objects.update(recherche=(
+        SearchVector('nom', weight='A', config='french')
+        + SearchVector('description', weight='B', config='french')
+    ))
+
+
+def supprimer_index_recherche(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nom in ('boutique_produit_recherche_gin', 'boutique_produit_nom_trgm'):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nom}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0003_produit_updated_at'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='produit',
+            name='recherche',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['categorie', 'prix', 'id'], name='produit_categorie_prix'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['categorie', 'date_ajout', 'id'], name='produit_categorie_date'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['prix', 'id'], name='produit_prix'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['date_ajout', 'id'], name='produit_date_ajout'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['stock', 'id'], name='produit_stock'),
+        ),
+        migrations.RunPython(creer_index_recherche, supprimer_index_recherche),
+    ]
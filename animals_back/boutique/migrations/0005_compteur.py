@@ -0,0 +1,58 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:40
+
+import re
+
+from django.db import migrations, models
+
+COMPTEURS = {
+    'commande': ('Commande', 'numero_commande'),
+    'produit': ('Produit', 'serial_number'),
+}
+
+
+def dernier_numero(model, champ):
+    numeros = [0]
+    for valeur in model.objects.values_list(champ, flat=True).iterator():
+        trouve = re.search(r'(\d+)$', valeur or '')
+        if trouve:
+            numeros.append(int(trouve.group(1)))
+    return max(numeros)
+
+
+def creer_compteurs(apps, schema_editor):
+    # Repart du plus grand numéro existant pour ne pas heurter la contrainte unique
+    Compteur = apps.get_model('boutique', 'Compteur')
+    for nom, (model_nom, champ) in COMPTEURS.items():
+        dernier = dernier_numero(apps.get_model('boutique', model_nom), champ)
+        if schema_editor.connection.vendor == 'postgresql':
+            sequence = f'boutique_numero_{nom}'
+            schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS {sequence}')
+            if dernier:
+                schema_editor.execute('SELECT setval(%s, %s)', [sequence, dernier])
+        else:
+            Compteur.objects.update_or_create(nom=nom, defaults={'valeur': dernier})
+
+
+def supprimer_compteurs(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nom in COMPTEURS:
+        schema_editor.execute(f'DROP SEQUENCE IF EXISTS boutique_numero_{nom}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0004_produit_recherche_et_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Compteur',
+            fields=[
+                ('nom', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valeur', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(creer_compteurs, supprimer_compteurs),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0005_compteur'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['utilisateur', '-date_commande', '-id'], name='commande_utilisateur_date'),
+        ),
+    ]
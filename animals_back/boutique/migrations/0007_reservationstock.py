@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0006_commande_utilisateur_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.PositiveIntegerField()),
+                ('expire_le', models.DateTimeField()),
+                ('panier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='boutique.panier')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='boutique.produit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['produit', 'expire_le', 'quantite'], name='reservation_produit_active'), models.Index(fields=['expire_le'], name='reservation_expiration')],
+                'constraints': [models.UniqueConstraint(fields=('panier', 'produit'), name='reservation_panier_produit')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0007_reservationstock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenteJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('categorie', models.CharField(max_length=20)),
+                ('nombre_commandes', models.IntegerField(default=0)),
+                ('quantite', models.IntegerField(default=0)),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantite_payee', models.IntegerField(default=0)),
+                ('chiffre_affaires_paye', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventes', to='boutique.produit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['jour', 'categorie'], name='vente_jour_categorie')],
+                'constraints': [models.UniqueConstraint(fields=('produit', 'jour', 'categorie'), name='vente_produit_jour_categorie')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.db.models.functions import Round
+from django.utils import timezone
+
+
+def calculer_prix_courant(apps, schema_editor):
+    Produit = apps.get_model('boutique', 'Produit')
+    maintenant = timezone.now()
+    promotion = models.Q(
+        discount_active=True, discount_start_date__lte=maintenant, discount_end_date__gte=maintenant,
+    )
+    Produit.objects.update(prix_courant=models.F('prix'), en_promotion=False)
+    Produit.objects.filter(promotion).update(
+        prix_courant=Round(models.F('prix') * (100 - models.F('discount_percent')) / 100, 2),
+        en_promotion=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0008_ventejournaliere'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produit',
+            name='en_promotion',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='produit',
+            name='prix_courant',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(calculer_prix_courant, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['categorie', 'prix_courant', 'id'], name='produit_categorie_prix_courant'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['prix_courant', 'id'], name='produit_prix_courant'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('en_promotion', True)), fields=['prix_courant', 'id'], name='produit_en_promotion'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('discount_active', True)), fields=['discount_start_date'], name='produit_promotion_debut'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('discount_active', True)), fields=['discount_end_date'], name='produit_promotion_fin'),
+        ),
+    ]
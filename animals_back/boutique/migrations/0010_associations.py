@@ -0,0 +1,41 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0009_produit_prix_courant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoAchat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.IntegerField(default=0)),
+                ('produit_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='boutique.produit')),
+                ('produit_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='boutique.produit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['produit_b'], name='coachat_produit_b')],
+                'constraints': [models.UniqueConstraint(fields=('produit_a', 'produit_b'), name='coachat_paire')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProduitAssocie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rang', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('nombre', models.IntegerField()),
+                ('associe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='boutique.produit')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='associes', to='boutique.produit')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('produit', 'rang'), name='produit_associe_rang')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:10
+
+from django.db import migrations
+
+# Même vecteur que boutique.Produit.CHAMPS_RECHERCHE (poids A et B), calculé par la base
+# à chaque écriture : les QuerySet.update() et bulk_create sont indexés aussi
+VECTEUR = (
+    "setweight(to_tsvector('french', coalesce(NEW.nom, '')), 'A')"
+    " || setweight(to_tsvector('french', coalesce(NEW.description, '')), 'B')"
+)
+
+
+def creer_declencheur(apps, schema_editor):
+    # SQLite uses animals.search.MoteurIndexInverse
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE OR REPLACE FUNCTION boutique_produit_recherche() RETURNS trigger AS $$ '
+        f'BEGIN NEW.recherche := {VECTEUR}; RETURN NEW; END '
+        '$$ LANGUAGE plpgsql'
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER boutique_produit_recherche '
+        'BEFORE INSERT OR UPDATE OF nom, description ON boutique_produit '
+        'FOR EACH ROW EXECUTE FUNCTION boutique_produit_recherche()'
+    )
+    # Lignes modifiées sans post_save depuis 0004
+    schema_editor.execute('UPDATE boutique_produit SET nom = nom')
+
+
+def supprimer_declencheur(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP TRIGGER IF EXISTS boutique_produit_recherche ON boutique_produit')
+    schema_editor.execute('DROP FUNCTION IF EXISTS boutique_produit_recherche()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0010_associations'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_declencheur, supprimer_declencheur),
+    ]
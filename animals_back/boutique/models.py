@@ -1,9 +1,75 @@
-from django.db import models
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import models, transaction
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Coalesce, Round
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 import pytz  # Ensure pytz is installed
 
+from animals.cache import incrementer_version
+
+from .numerotation import attribuer_numeros
+
+
+def condition_promotion(prefixe='', maintenant=None):
+    """ Promotion active à `maintenant` ; `prefixe` pour une relation (ex: 'produit__'). """
+    maintenant = maintenant or timezone.now()
+    return models.Q(**{
+        f'{prefixe}discount_active': True,
+        f'{prefixe}discount_start_date__lte': maintenant,
+        f'{prefixe}discount_end_date__gte': maintenant,
+    })
+
+
+def annotations_prix(prefixe='', maintenant=None):
+    """
+    `on_sale` et `effective_price` calculés par la base, équivalents à
+    Produit.is_discount_active / Produit.prix_promotion mais triables et filtrables.
+    """
+    promotion = condition_promotion(prefixe, maintenant)
+    prix = models.F(f'{prefixe}prix')
+    remise = prix * (100 - models.F(f'{prefixe}discount_percent')) / 100
+    return {
+        'on_sale': models.Case(
+            models.When(promotion, then=models.Value(True)),
+            default=models.Value(False),
+            output_field=models.BooleanField(),
+        ),
+        'effective_price': models.Case(
+            models.When(promotion, then=Round(remise, 2)),
+            default=prix,
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+    }
+
+
+class ProduitQuerySet(models.QuerySet):
+    def avec_prix_effectif(self, maintenant=None):
+        return self.annotate(**annotations_prix(maintenant=maintenant))
+
+    def en_promotion(self, maintenant=None):
+        return self.filter(condition_promotion(maintenant=maintenant))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # save() n'est pas appelé : le prix matérialisé est calculé ici
+        objs = list(objs)
+        for obj in objs:
+            obj.prix_courant, obj.en_promotion = obj.calculer_prix_courant()
+        crees = super().bulk_create(objs, *args, **kwargs)
+        # Ni post_save ni signal : les facettes en cache sont invalidées ici, au commit
+        transaction.on_commit(lambda: incrementer_version('produits'))
+        return crees
+
+    def avec_stock_disponible(self, maintenant=None):
+        """ `stock_disponible` = stock - réservations actives (agrégat sur l'index reservation_produit_active). """
+        reserve = ReservationStock.objects.filter(
+            produit=models.OuterRef('pk'), expire_le__gt=maintenant or timezone.now()
+        ).values('produit').annotate(total=models.Sum('quantite')).values('total')
+        return self.annotate(stock_disponible=models.F('stock') - Coalesce(models.Subquery(reserve), 0))
+
+
 class Produit(models.Model):
     CATEGORIES = [
         ('Nutrition', 'Nutrition'),
@@ -18,6 +84,7 @@ class Produit(models.Model):
     categorie = models.CharField(max_length=20, choices=CATEGORIES, default='Nutrition')
     image = models.ImageField(upload_to='products/')
     date_ajout = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     discount_percent = models.DecimalField(
         max_digits=5, 
         decimal_places=2, 
@@ -39,15 +106,49 @@ class Produit(models.Model):
         blank=True,
         verbose_name='Fin de la promotion'
     )
+    # Prix matérialisé, recalculé à l'enregistrement et aux bornes des promotions
+    # par la commande planifier_promotions (voir promotions.py)
+    prix_courant = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    en_promotion = models.BooleanField(default=False, editable=False)
+    # Recherche plein texte (maintenu par animals.search, voir signals.py)
+    recherche = SearchVectorField(null=True, editable=False)
+
+    CHAMPS_RECHERCHE = {'nom': 'A', 'description': 'B'}
+    CHAMPS_TRIGRAMME = ('nom',)
+
+    objects = ProduitQuerySet.as_manager()
+
+    class Meta:
+        # Tris autorisés de get_produits (id en dernier pour la pagination par curseur)
+        indexes = [
+            models.Index(fields=['categorie', 'prix', 'id'], name='produit_categorie_prix'),
+            models.Index(fields=['categorie', 'date_ajout', 'id'], name='produit_categorie_date'),
+            models.Index(fields=['prix', 'id'], name='produit_prix'),
+            models.Index(fields=['date_ajout', 'id'], name='produit_date_ajout'),
+            models.Index(fields=['stock', 'id'], name='produit_stock'),
+            models.Index(fields=['categorie', 'prix_courant', 'id'], name='produit_categorie_prix_courant'),
+            models.Index(fields=['prix_courant', 'id'], name='produit_prix_courant'),
+            models.Index(fields=['prix_courant', 'id'], condition=models.Q(en_promotion=True),
+                         name='produit_en_promotion'),
+            # Bornes des promotions, lues par planifier_promotions
+            models.Index(fields=['discount_start_date'], condition=models.Q(discount_active=True),
+                         name='produit_promotion_debut'),
+            models.Index(fields=['discount_end_date'], condition=models.Q(discount_active=True),
+                         name='produit_promotion_fin'),
+        ]
 
     @property
     def prix_promotion(self):
+        if hasattr(self, 'effective_price'):
+            return self.effective_price
         if self.is_discount_active:
             return self.prix * (1 - self.discount_percent / 100)
         return self.prix
 
     @property
     def is_discount_active(self):
+        if hasattr(self, 'on_sale'):
+            return self.on_sale
         if not self.discount_active:
             return False
 
@@ -58,15 +159,40 @@ class Produit(models.Model):
             and self.discount_start_date <= now <= self.discount_end_date
         )
 
+    def calculer_prix_courant(self, maintenant=None):
+        """ (prix_courant, en_promotion) à `maintenant`, arrondi comme annotations_prix. """
+        maintenant = maintenant or timezone.now()
+        actif = bool(
+            self.discount_active
+            and self.discount_start_date
+            and self.discount_end_date
+            and self.discount_start_date <= maintenant <= self.discount_end_date
+        )
+        prix = Decimal(str(self.prix))
+        if actif:
+            remise = prix * (100 - Decimal(str(self.discount_percent))) / 100
+            return remise.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP), True
+        return prix, False
+
     def save(self, *args, **kwargs):
         if not self.serial_number:
-            last_id = Produit.objects.aggregate(models.Max('id'))['id__max'] or 0
-            self.serial_number = f"PROD-{str(last_id + 1).zfill(4)}"
+            attribuer_numeros([self], 'serial_number', 'produit')
+        self.prix_courant, self.en_promotion = self.calculer_prix_courant()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'prix_courant', 'en_promotion'}
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.serial_number} - {self.nom}"
 
+class Compteur(models.Model):
+    """ Compteurs de numérotation hors PostgreSQL (voir numerotation.py). """
+    nom = models.CharField(max_length=50, primary_key=True)
+    valeur = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nom} = {self.valeur}"
+
 class Panier(models.Model):
     utilisateur = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     date_creation = models.DateTimeField(auto_now_add=True)
@@ -83,6 +209,27 @@ class ArticlesPanier(models.Model):
     def __str__(self):
         return f"{self.quantite} x {self.produit.nom} dans le panier de {self.panier.utilisateur.username}"
 
+class ReservationStock(models.Model):
+    """ Stock retenu pour un article du panier jusqu'à `expire_le` (voir services.reserver_stock). """
+    panier = models.ForeignKey(Panier, on_delete=models.CASCADE, related_name='reservations')
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='reservations')
+    quantite = models.PositiveIntegerField()
+    expire_le = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['panier', 'produit'], name='reservation_panier_produit'),
+        ]
+        indexes = [
+            # Somme des réservations actives d'un produit lue dans l'index seul
+            models.Index(fields=['produit', 'expire_le', 'quantite'], name='reservation_produit_active'),
+            # Purge des réservations expirées
+            models.Index(fields=['expire_le'], name='reservation_expiration'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantite} x {self.produit_id} réservés jusqu'à {self.expire_le}"
+
 class Commande(models.Model):
     numero_commande = models.CharField(max_length=10, unique=True, blank=True)
     utilisateur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -102,10 +249,15 @@ class Commande(models.Model):
     telephone = models.CharField(max_length=20, blank=True, null=True)
     methode_paiement = models.CharField(max_length=50, default='livraison')
 
+    class Meta:
+        # Historique paginé de mes_commandes
+        indexes = [
+            models.Index(fields=['utilisateur', '-date_commande', '-id'], name='commande_utilisateur_date'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.numero_commande:
-            last_id = Commande.objects.count() + 1
-            self.numero_commande = f"CMD-{str(last_id).zfill(4)}"
+            attribuer_numeros([self], 'numero_commande', 'commande')
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -122,6 +274,63 @@ class ArticlesCommande(models.Model):
         verbose_name='Prix unitaire (avec remise)')
     def __str__(self):
         return f"{self.quantite} x {self.produit.nom} dans {self.commande.numero_commande}"
+class VenteJournaliere(models.Model):
+    """
+    Ventes cumulées par produit, jour (date de commande) et catégorie, tenues à jour
+    par boutique/ventes.py à la création des commandes et aux changements de statut.
+    Les colonnes *_payees ne comptent que les commandes au statut payé ou au-delà.
+    """
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='ventes')
+    jour = models.DateField()
+    categorie = models.CharField(max_length=20)
+    nombre_commandes = models.IntegerField(default=0)
+    quantite = models.IntegerField(default=0)
+    chiffre_affaires = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantite_payee = models.IntegerField(default=0)
+    chiffre_affaires_paye = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['produit', 'jour', 'categorie'], name='vente_produit_jour_categorie'),
+        ]
+        indexes = [
+            models.Index(fields=['jour', 'categorie'], name='vente_jour_categorie'),
+        ]
+
+    def __str__(self):
+        return f"{self.jour} {self.produit_id} : {self.quantite}"
+
+class CoAchat(models.Model):
+    """
+    Nombre de commandes contenant à la fois produit_a et produit_b (produit_a <= produit_b ;
+    la diagonale produit_a == produit_b compte les commandes contenant le produit).
+    Alimenté par boutique/associations.py.
+    """
+    produit_a = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='+')
+    produit_b = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='+')
+    nombre = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['produit_a', 'produit_b'], name='coachat_paire'),
+        ]
+        indexes = [
+            models.Index(fields=['produit_b'], name='coachat_produit_b'),
+        ]
+
+class ProduitAssocie(models.Model):
+    """ Top-K des produits « souvent achetés ensemble », servi tel quel par l'API. """
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='associes')
+    associe = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='+')
+    rang = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    nombre = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['produit', 'rang'], name='produit_associe_rang'),
+        ]
+
 class Notification(models.Model):
     utilisateur = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
@@ -0,0 +1,55 @@
+# boutique/numerotation.py
+from django.db import connection, transaction
+from django.db.models import F
+
+# Compteurs utilisés par les modèles (séquences créées par la migration 0005)
+FORMATS = {
+    'commande': 'CMD-{:04d}',
+    'produit': 'PROD-{:04d}',
+}
+
+
+def nom_sequence(nom):
+    # Seuls les compteurs de FORMATS ont une séquence (et une ligne Compteur)
+    if nom not in FORMATS:
+        raise ValueError(f"Compteur inconnu : {nom}")
+    return f'boutique_numero_{nom}'
+
+
+def allouer_numeros(nom, nombre=1):
+    """
+    Réserve `nombre` numéros pour le compteur `nom` et les renvoie triés.
+    PostgreSQL : nextval() sur une séquence, sans verrou ni transaction
+    (un numéro alloué dans une transaction annulée n'est pas réutilisé).
+    Autres bases : table Compteur, l'UPDATE verrouille la ligne jusqu'à la fin
+    de la transaction englobante.
+    Un bloc entier est réservé en une seule requête (imports en masse).
+    `nom` est une clé de FORMATS (ValueError sinon).
+    """
+    sequence = nom_sequence(nom)
+    if nombre < 1:
+        return []
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(%s) FROM generate_series(1, %s)',
+                [sequence, nombre],
+            )
+            return sorted(ligne[0] for ligne in cursor.fetchall())
+
+    from .models import Compteur
+
+    with transaction.atomic():
+        if not Compteur.objects.filter(nom=nom).update(valeur=F('valeur') + nombre):
+            Compteur.objects.get_or_create(nom=nom)
+            Compteur.objects.filter(nom=nom).update(valeur=F('valeur') + nombre)
+        fin = Compteur.objects.filter(nom=nom).values_list('valeur', flat=True).get()
+    return list(range(fin - nombre + 1, fin + 1))
+
+
+def attribuer_numeros(objets, champ, nom):
+    """ Renseigne `champ` sur les objets qui n'en ont pas encore, avec un seul bloc alloué. """
+    sans_numero = [objet for objet in objets if not getattr(objet, champ)]
+    for objet, numero in zip(sans_numero, allouer_numeros(nom, len(sans_numero))):
+        setattr(objet, champ, FORMATS[nom].format(numero))
+    return objets
@@ -0,0 +1,63 @@
+# boutique/promotions.py
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from animals.cache import incrementer_version
+
+from .models import Produit, annotations_prix, condition_promotion
+
+TAILLE_LOT = 1000
+
+
+def a_rafraichir(maintenant, complet=False):
+    """
+    Produits dont prix_courant / en_promotion ne correspondent plus à `maintenant`.
+    Par défaut seuls les franchissements de bornes sont cherchés (index partiels
+    sur les dates et sur en_promotion) ; `complet` compare aussi chaque prix
+    (à utiliser après des QuerySet.update() de prix ou de remise).
+    """
+    promotion = condition_promotion(maintenant=maintenant)
+    condition = (promotion & Q(en_promotion=False)) | (~promotion & Q(en_promotion=True))
+    if complet:
+        condition |= ~Q(prix_courant=annotations_prix(maintenant=maintenant)['effective_price'])
+    return Produit.objects.filter(condition)
+
+
+def appliquer_promotions(maintenant=None, complet=False):
+    """
+    Active / expire les promotions en masse : un UPDATE par lot de produits,
+    prix recalculé par la base. Renvoie les ids modifiés ; seuls ces produits
+    voient leur updated_at (ETag) et leur version de cache changer.
+    """
+    maintenant = maintenant or timezone.now()
+    ids = list(a_rafraichir(maintenant, complet).order_by('id').values_list('id', flat=True))
+    annotations = annotations_prix(maintenant=maintenant)
+    for debut in range(0, len(ids), TAILLE_LOT):
+        lot = ids[debut:debut + TAILLE_LOT]
+        with transaction.atomic():
+            Produit.objects.filter(id__in=lot).update(
+                prix_courant=annotations['effective_price'],
+                en_promotion=annotations['on_sale'],
+                updated_at=maintenant,
+            )
+            transaction.on_commit(lambda lot=lot: invalider_produits(lot))
+    return ids
+
+
+def invalider_produits(ids):
+    for produit_id in ids:
+        incrementer_version(f'produit:{produit_id}')
+    # Facettes de la grille (comptes en promotion / par tranche de prix)
+    incrementer_version('produits')
+
+
+def prochaine_echeance(maintenant=None):
+    """ Prochain début ou fin de promotion après `maintenant`, ou None. """
+    maintenant = maintenant or timezone.now()
+    bornes = Produit.objects.filter(discount_active=True).aggregate(
+        debut=Min('discount_start_date', filter=Q(discount_start_date__gt=maintenant)),
+        fin=Min('discount_end_date', filter=Q(discount_end_date__gte=maintenant)),
+    )
+    echeances = [borne for borne in bornes.values() if borne is not None]
+    return min(echeances) if echeances else None
@@ -6,13 +6,14 @@ from .models import ArticlesCommande, Commande, Notification, Produit
 class ProduitSerializer(serializers.ModelSerializer):
      is_discount_active = serializers.SerializerMethodField()
      prix_promotion      = serializers.SerializerMethodField()
+     stock_disponible    = serializers.SerializerMethodField()
  
      class Meta:
          model  = Produit
          fields = [
              'id', 'nom', 'description', 'prix', 'prix_promotion',
              'stock', 'categorie', 'image', 'is_discount_active',
-             'discount_percent', 'date_ajout'
+             'discount_percent', 'date_ajout', 'stock_disponible'
          ]
 
      def get_is_discount_active(self, obj):
@@ -20,6 +21,10 @@ class ProduitSerializer(serializers.ModelSerializer):
 
      def get_prix_promotion(self, obj):
         return obj.prix_promotion  # Expose computed property
+
+     def get_stock_disponible(self, obj):
+        # Stock moins les réservations actives des paniers (annoté par get_produits)
+        return getattr(obj, 'stock_disponible', obj.stock)
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
@@ -46,5 +51,5 @@ class CommandeDetailSerializer(serializers.ModelSerializer):
                  'adresse_livraison', 'methode_paiement', 'items']
 
     def get_items(self, obj):
-        articles = ArticlesCommande.objects.filter(commande=obj)
-        return ArticlesCommandeSerializer(articles, many=True).data
+        # Lignes préchargées par mes_commandes (Prefetch + select_related('produit'))
+        return ArticlesCommandeSerializer(obj.articlescommande_set.all(), many=True).data
@@ -0,0 +1,307 @@
+# boutique/services.py
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.db.models.functions import Greatest
+from django.conf import settings
+from django.utils import timezone
+
+from .models import (
+    ArticlesCommande, ArticlesPanier, Commande, Panier, Produit, ReservationStock, annotations_prix,
+)
+from .ventes import enregistrer_commande
+
+
+class RequeteRefusee(Exception):
+    """ Opération refusée ; la transaction est annulée et `details` est ajouté à la réponse. """
+
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details
+
+
+class CommandeRefusee(RequeteRefusee):
+    """ Panier absent ou vide, stock insuffisant. """
+
+
+class PanierInvalide(RequeteRefusee):
+    """ Opérations de synchronisation du panier mal formées. """
+
+
+class StockInsuffisant(RequeteRefusee):
+    """ Quantité demandée supérieure au stock non réservé par d'autres paniers. """
+
+    def __init__(self, nom, produit_id, disponible):
+        super().__init__(
+            f'Not enough stock for {nom}. Available: {disponible}',
+            status=409, produit_id=produit_id, disponible=disponible,
+        )
+
+
+OPERATIONS_PANIER = ('set', 'add', 'remove')
+MAX_OPERATIONS_PANIER = 100
+
+
+def passer_commande(utilisateur, adresse_livraison='', telephone='', methode_paiement='livraison'):
+    """
+    Transforme le panier de `utilisateur` en commande.
+    Les articles couverts par une réservation active ont déjà leur stock
+    garanti : leurs produits ne sont ni verrouillés ni revalidés. Les autres
+    sont verrouillés dans un ordre fixe (le panier, puis les produits par id
+    croissant) pour que deux commandes concurrentes ne puissent pas s'interbloquer,
+    et validés contre le stock non réservé par d'autres paniers.
+    Les lignes sont créées en un seul INSERT et le stock décrémenté par un
+    UPDATE conditionnel (stock >= quantité) par produit : un échec annule tout.
+    """
+    with transaction.atomic():
+        panier = Panier.objects.select_for_update().filter(utilisateur=utilisateur).first()
+        if panier is None:
+            raise CommandeRefusee('Cart not found', status=404)
+
+        quantites = dict(ArticlesPanier.objects.filter(panier=panier).values_list('produit_id', 'quantite'))
+        if not quantites:
+            raise CommandeRefusee('Cart is empty')
+
+        maintenant = timezone.now()
+        reservees = dict(
+            ReservationStock.objects.filter(panier=panier, expire_le__gt=maintenant)
+            .values_list('produit_id', 'quantite')
+        )
+        non_couverts = sorted(
+            produit_id for produit_id, quantite in quantites.items() if reservees.get(produit_id, 0) < quantite
+        )
+        if non_couverts:
+            verrouilles = (
+                Produit.objects.select_for_update()
+                .filter(id__in=non_couverts)
+                .avec_stock_disponible(maintenant)
+                .order_by('id')
+                .values_list('id', 'nom', 'stock_disponible')
+            )
+            # Validate inventory first (rows are locked, the values are current)
+            for produit_id, nom, disponible in verrouilles:
+                disponible += reservees.get(produit_id, 0)
+                if disponible < quantites[produit_id]:
+                    raise CommandeRefusee(
+                        f'Not enough stock for {nom}. Available: {disponible}',
+                        produit_id=produit_id,
+                    )
+
+        produits = list(Produit.objects.filter(id__in=quantites).avec_prix_effectif().order_by('id'))
+
+        commande = Commande.objects.create(
+            utilisateur=utilisateur,
+            total_prix=sum(produit.effective_price * quantites[produit.id] for produit in produits),
+            statut="En attente",
+            adresse_livraison=adresse_livraison,
+            telephone=telephone,
+            methode_paiement=methode_paiement,
+        )
+        ArticlesCommande.objects.bulk_create([
+            ArticlesCommande(
+                commande=commande,
+                produit=produit,
+                quantite=quantites[produit.id],
+                prix_unitaire=produit.effective_price,  # Store exact price at order time
+            )
+            for produit in produits
+        ])
+
+        enregistrer_commande(commande, [
+            (produit.id, produit.categorie, quantites[produit.id], produit.effective_price) for produit in produits
+        ])
+
+        # Reduce inventory, the holds are consumed by the order
+        for produit in produits:
+            quantite = quantites[produit.id]
+            modifies = Produit.objects.filter(id=produit.id, stock__gte=quantite).update(
+                stock=F('stock') - quantite, updated_at=maintenant,
+            )
+            if not modifies:
+                raise CommandeRefusee(f'Not enough stock for {produit.nom}', produit_id=produit.id)
+
+        # Clear cart
+        ReservationStock.objects.filter(panier=panier).delete()
+        ArticlesPanier.objects.filter(panier=panier).delete()
+    return commande
+
+
+def contenu_panier(panier):
+    """ Articles du panier au prix effectif, avec les totaux (une requête). """
+    articles = ArticlesPanier.objects.filter(panier=panier).select_related('produit').annotate(
+        **annotations_prix('produit__')
+    ).order_by('id')
+    items = [
+        {
+            'id': article.produit.id,
+            'nom': article.produit.nom,
+            'prix': float(article.effective_price),
+            'image': article.produit.image.url if article.produit.image else None,
+            'quantity': article.quantite,
+        }
+        for article in articles
+    ]
+    return {
+        'items': items,
+        'total': float(sum(article.effective_price * article.quantite for article in articles)),
+        'nombre_articles': sum(article.quantite for article in articles),
+    }
+
+
+def _replier_operations(operations):
+    """
+    Réduit la liste d'opérations à un effet par produit, dans l'ordre reçu :
+    {produit_id: ('set', quantité)} (absolu, 0 pour retirer) ou ('add', delta).
+    """
+    if not isinstance(operations, list) or not operations:
+        raise PanierInvalide('operations doit être une liste non vide')
+    if len(operations) > MAX_OPERATIONS_PANIER:
+        raise PanierInvalide(f'{MAX_OPERATIONS_PANIER} opérations au maximum')
+
+    effets = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS_PANIER:
+            raise PanierInvalide('Opération inconnue', index=index, allowed=list(OPERATIONS_PANIER))
+        try:
+            produit_id = int(operation.get('produit_id'))
+            quantite = int(operation.get('quantity', 1 if operation['op'] == 'add' else 0))
+        except (TypeError, ValueError):
+            raise PanierInvalide('produit_id et quantity doivent être des entiers', index=index)
+        if operation['op'] == 'set' and quantite < 0:
+            raise PanierInvalide('quantity doit être positive', index=index)
+
+        genre, valeur = effets.get(produit_id, ('add', 0))
+        if operation['op'] == 'remove':
+            effets[produit_id] = ('set', 0)
+        elif operation['op'] == 'set':
+            effets[produit_id] = ('set', quantite)
+        else:
+            effets[produit_id] = (genre, max(valeur + quantite, 0) if genre == 'set' else valeur + quantite)
+    return effets
+
+
+def synchroniser_panier(utilisateur, operations):
+    """
+    Applique un lot d'opérations set/add/remove au panier en une transaction
+    et un nombre fixe de requêtes : un bulk_create des nouveaux articles,
+    un bulk_update des quantités fixées, un UPDATE avec F() pour les
+    incréments et un DELETE des articles retirés ou tombés à zéro.
+    Le panier est verrouillé : deux synchronisations du même panier sont sérialisées.
+    """
+    effets = _replier_operations(operations)
+
+    with transaction.atomic():
+        connus = set(Produit.objects.filter(id__in=effets).values_list('id', flat=True))
+        inconnus = sorted(set(effets) - connus)
+        if inconnus:
+            raise PanierInvalide('Produits introuvables', status=404, produits_inconnus=inconnus)
+
+        panier, _ = Panier.objects.get_or_create(utilisateur=utilisateur)
+        panier = Panier.objects.select_for_update().get(pk=panier.pk)
+        existants = {
+            article.produit_id: article
+            for article in ArticlesPanier.objects.filter(panier=panier, produit_id__in=effets)
+        }
+
+        a_creer, a_modifier, increments, a_retirer = [], [], {}, []
+        for produit_id, (genre, valeur) in effets.items():
+            article = existants.get(produit_id)
+            if genre == 'set' and valeur == 0:
+                if article:
+                    a_retirer.append(produit_id)
+            elif article is None:
+                if valeur > 0:
+                    a_creer.append(ArticlesPanier(panier=panier, produit_id=produit_id, quantite=valeur))
+            elif genre == 'set':
+                article.quantite = valeur
+                a_modifier.append(article)
+            elif valeur:
+                increments[produit_id] = valeur
+
+        if a_creer:
+            ArticlesPanier.objects.bulk_create(a_creer)
+        if a_modifier:
+            ArticlesPanier.objects.bulk_update(a_modifier, ['quantite'])
+        if increments:
+            ArticlesPanier.objects.filter(panier=panier, produit_id__in=increments).update(quantite=Greatest(
+                Case(*[When(produit_id=produit_id, then=F('quantite') + delta)
+                       for produit_id, delta in increments.items()]),
+                0,
+            ))
+        if a_retirer or any(delta < 0 for delta in increments.values()):
+            ArticlesPanier.objects.filter(panier=panier).filter(
+                Q(produit_id__in=a_retirer) | Q(quantite=0)
+            ).delete()
+
+        finales = dict(
+            ArticlesPanier.objects.filter(panier=panier, produit_id__in=effets).values_list('produit_id', 'quantite')
+        )
+        reserver_stock(panier, {produit_id: finales.get(produit_id, 0) for produit_id in effets})
+    return panier
+
+
+# Réservations de stock
+
+def expiration_reservation(maintenant=None):
+    return (maintenant or timezone.now()) + timedelta(seconds=getattr(settings, 'BOUTIQUE_RESERVATION_TTL', 900))
+
+
+def reserver_stock(panier, quantites):
+    """
+    Aligne les réservations du panier sur `quantites` ({produit_id: quantité}, 0 pour libérer)
+    et repousse leur expiration. Seuls les produits dont la réservation augmente sont
+    verrouillés, le temps de vérifier le stock non réservé par les autres paniers.
+    À appeler dans la transaction qui modifie le panier : StockInsuffisant l'annule.
+    """
+    maintenant = timezone.now()
+    actuelles = dict(
+        ReservationStock.objects.filter(panier=panier, produit_id__in=quantites, expire_le__gt=maintenant)
+        .values_list('produit_id', 'quantite')
+    )
+    hausses = sorted(
+        produit_id for produit_id, quantite in quantites.items() if quantite > actuelles.get(produit_id, 0)
+    )
+    if hausses:
+        verrouilles = (
+            Produit.objects.select_for_update()
+            .filter(id__in=hausses)
+            .avec_stock_disponible(maintenant)
+            .order_by('id')
+            .values_list('id', 'nom', 'stock_disponible')
+        )
+        for produit_id, nom, disponible in verrouilles:
+            # La réservation actuelle du panier est comptée dans les réservations actives
+            disponible += actuelles.get(produit_id, 0)
+            if quantites[produit_id] > disponible:
+                raise StockInsuffisant(nom, produit_id, disponible)
+
+    expire_le = expiration_reservation(maintenant)
+    conservees = [
+        ReservationStock(panier=panier, produit_id=produit_id, quantite=quantite, expire_le=expire_le)
+        for produit_id, quantite in quantites.items() if quantite > 0
+    ]
+    if conservees:
+        ReservationStock.objects.bulk_create(
+            conservees, update_conflicts=True,
+            unique_fields=['panier', 'produit'], update_fields=['quantite', 'expire_le'],
+        )
+    liberees = [produit_id for produit_id, quantite in quantites.items() if quantite <= 0]
+    if liberees:
+        ReservationStock.objects.filter(panier=panier, produit_id__in=liberees).delete()
+
+
+def purger_reservations(maintenant=None, taille_lot=5000):
+    """ Supprime les réservations expirées par lots (elles ne comptent déjà plus dans le stock disponible). """
+    maintenant = maintenant or timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            ReservationStock.objects.filter(expire_le__lte=maintenant)
+            .order_by('expire_le').values_list('pk', flat=True)[:taille_lot]
+        )
+        if not ids:
+            return total
+        total += ReservationStock.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,40 @@
+# boutique/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from animals.search import moteur_pour
+
+from .models import Commande, Produit
+from .promotions import invalider_produits
+from .ventes import statut_modifie
+
+
+@receiver(post_save, sender=Produit)
+def indexer_produit(sender, instance, **kwargs):
+    moteur_pour(Produit).indexer(instance)
+    # Après le commit : une lecture intercalée remettrait sinon l'ancien produit en cache
+    ids = [instance.pk]
+    transaction.on_commit(lambda: invalider_produits(ids))
+
+
+@receiver(post_delete, sender=Produit)
+def desindexer_produit(sender, instance, **kwargs):
+    moteur_pour(Produit).desindexer(instance)
+    ids = [instance.pk]
+    transaction.on_commit(lambda: invalider_produits(ids))
+
+
+@receiver(post_init, sender=Commande)
+def memoriser_statut(sender, instance, **kwargs):
+    # Sans requête : le collecteur des suppressions en cascade charge les commandes avec .only()
+    instance._statut_initial = instance.__dict__.get('statut')
+
+
+@receiver(post_save, sender=Commande)
+def reporter_statut(sender, instance, created, **kwargs):
+    # Les QuerySet.update() de statut ne passent pas ici : lancer reconstruire_ventes après coup
+    statut = instance.__dict__.get('statut')  # champ différé : non modifié
+    if not created and statut != instance._statut_initial:
+        statut_modifie(instance, instance._statut_initial)
+    instance._statut_initial = statut
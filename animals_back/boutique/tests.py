@@ -1,3 +1,634 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    ArticlesCommande, ArticlesPanier, Commande, Panier, Produit, ProduitAssocie, ReservationStock, VenteJournaliere,
+)
+from . import associations
+from .numerotation import allouer_numeros, attribuer_numeros
+from .promotions import appliquer_promotions, prochaine_echeance
+from .ventes import reconstruire
+from .services import CommandeRefusee, StockInsuffisant, passer_commande, purger_reservations, synchroniser_panier
+
+
+def creer_client(email):
+    return get_user_model().objects.create_user(
+        email=email, password='secret', nom='Client', prenom='Test',
+        telephone='0000', role='Proprietaire', adresse='Sfax',
+    )
+
+
+class CatalogueProduitsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Produit.objects.bulk_create(attribuer_numeros([
+            Produit(
+                nom=f'Croquettes {i}', prix=Decimal(10 + i % 7), stock=i % 5,
+                categorie='Nutrition' if i % 2 else 'Accessoires', image='products/p.jpg',
+            )
+            for i in range(35)
+        ], 'serial_number', 'produit'))
+        Produit.objects.create(nom='Laisse en cuir', prix=Decimal('19.90'), stock=3,
+                               categorie='Accessoires', image='products/laisse.jpg')
+
+    def parcourir(self, params):
+        ids, cursor = [], ''
+        while True:
+            page_params = dict(params, page_size=8)
+            if cursor:
+                page_params['cursor'] = cursor
+            response = self.client.get(reverse('get_produits'), page_params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            ids += [produit['id'] for produit in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_cursor_walks_every_product_once_for_each_ordering(self):
+        for ordering in ('prix', '-prix', 'date_ajout', '-stock'):
+            champ = ordering.lstrip('-')
+            sens = '-' if ordering.startswith('-') else ''
+            attendus = list(Produit.objects.filter(categorie='Nutrition').order_by(
+                ordering, f'{sens}id').values_list('id', flat=True))
+            self.assertEqual(self.parcourir({'categorie': 'Nutrition', 'ordering': ordering}), attendus, champ)
+
+    def test_unknown_ordering_is_rejected(self):
+        response = self.client.get(reverse('get_produits'), {'ordering': 'serial_number'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('prix', response.json()['allowed'])
+
+    def test_unpaginated_response_kept_for_old_clients(self):
+        response = self.client.get(reverse('get_produits'), {'ordering': 'prix'})
+        self.assertEqual(len(response.json()), 36)
+
+    def test_search_ranks_matching_products(self):
+        response = self.client.get(reverse('get_produits'), {'search': 'laise'})
+        self.assertEqual([p['nom'] for p in response.json()], ['Laisse en cuir'])
+
+
+class PrixEffectifTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        maintenant = timezone.now()
+        promotion = {
+            'discount_active': True,
+            'discount_start_date': maintenant - timedelta(days=1),
+            'discount_end_date': maintenant + timedelta(days=1),
+        }
+        cls.plein_tarif = Produit.objects.create(nom='Gamelle', prix=Decimal('20.00'), image='products/a.jpg')
+        cls.solde = Produit.objects.create(nom='Harnais', prix=Decimal('40.00'), discount_percent=75,
+                                           image='products/b.jpg', **promotion)
+        cls.expire = Produit.objects.create(
+            nom='Panier', prix=Decimal('10.00'), discount_percent=50, image='products/c.jpg',
+            discount_active=True, discount_start_date=maintenant - timedelta(days=10),
+            discount_end_date=maintenant - timedelta(days=5),
+        )
+
+    def test_annotations_match_python_properties(self):
+        for produit in Produit.objects.avec_prix_effectif():
+            reference = Produit.objects.get(pk=produit.pk)
+            self.assertEqual(produit.on_sale, bool(reference.is_discount_active))
+            self.assertEqual(produit.effective_price, reference.prix_promotion)
+
+    def test_on_sale_filter(self):
+        response = self.client.get(reverse('get_produits'), {'on_sale': '1'})
+        self.assertEqual([p['id'] for p in response.json()], [self.solde.id])
+
+    def test_effective_price_ordering_with_cursor(self):
+        attendus = [self.solde.id, self.expire.id, self.plein_tarif.id]
+        response = self.client.get(reverse('get_produits'), {'ordering': 'effective_price'})
+        self.assertEqual([p['id'] for p in response.json()], attendus)
+
+        params = {'ordering': 'effective_price', 'page_size': 2}
+        page = self.client.get(reverse('get_produits'), params).json()
+        suite = self.client.get(reverse('get_produits'), dict(params, cursor=page['next_cursor'])).json()
+        self.assertEqual([p['id'] for p in page['results'] + suite['results']], attendus)
+
+    def test_cart_uses_effective_price(self):
+        utilisateur = creer_client('client@example.com')
+        panier = Panier.objects.create(utilisateur=utilisateur)
+        ArticlesPanier.objects.create(panier=panier, produit=self.solde, quantite=2)
+        client = APIClient()
+        client.force_authenticate(utilisateur)
+        response = client.get(reverse('get_panier'))
+        self.assertEqual(response.json()[0]['prix'], 10.0)
+
+
+class CommandeTests(TestCase):
+    def setUp(self):
+        self.utilisateur = creer_client('acheteur@example.com')
+        self.panier = Panier.objects.create(utilisateur=self.utilisateur)
+        self.produits = [
+            Produit.objects.create(nom=f'Produit {i}', prix=Decimal('5.00'), stock=4, image='products/p.jpg')
+            for i in range(3)
+        ]
+        for produit in self.produits:
+            ArticlesPanier.objects.create(panier=self.panier, produit=produit, quantite=3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.utilisateur)
+
+    def test_checkout_decrements_stock_and_empties_cart(self):
+        response = self.client.post(reverse('creer_commande'), {'adresse_livraison': 'Sfax'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        commande = Commande.objects.get()
+        self.assertEqual(commande.total_prix, Decimal('45.00'))
+        self.assertEqual(ArticlesCommande.objects.filter(commande=commande).count(), 3)
+        self.assertEqual(set(Produit.objects.values_list('stock', flat=True)), {1})
+        self.assertFalse(ArticlesPanier.objects.exists())
+
+    def test_insufficient_stock_rolls_everything_back(self):
+        Produit.objects.filter(pk=self.produits[2].pk).update(stock=2)
+        with self.assertRaises(CommandeRefusee):
+            passer_commande(self.utilisateur)
+        self.assertFalse(Commande.objects.exists())
+        self.assertEqual(list(Produit.objects.order_by('id').values_list('stock', flat=True)), [4, 4, 2])
+        self.assertEqual(ArticlesPanier.objects.count(), 3)
+
+    def test_line_inserts_do_not_grow_with_the_cart(self):
+        with CaptureQueriesContext(connection) as requetes:
+            passer_commande(self.utilisateur)
+        sql = [requete['sql'] for requete in requetes.captured_queries]
+        self.assertEqual(sum('INSERT INTO "boutique_articlescommande"' in q for q in sql), 1)
+        self.assertEqual(sum(q.startswith('UPDATE "boutique_produit"') for q in sql), 3)
+
+
+class NumerotationTests(TestCase):
+    def test_blocks_are_disjoint_and_increasing(self):
+        premier = allouer_numeros('produit', 5)
+        second = allouer_numeros('produit', 3)
+        self.assertEqual(len(premier), 5)
+        self.assertEqual(len(set(premier + second)), 8)
+        self.assertLess(max(premier), min(second))
+
+    def test_unknown_counters_are_rejected(self):
+        # Pas de séquence PostgreSQL ni de ligne Compteur créée à la volée
+        with self.assertRaises(ValueError):
+            allouer_numeros('import', 5)
+
+    def test_models_number_new_rows_without_counting_the_table(self):
+        utilisateur = creer_client('numeros@example.com')
+        with CaptureQueriesContext(connection) as requetes:
+            commandes = [Commande.objects.create(utilisateur=utilisateur, total_prix=0) for _ in range(3)]
+        self.assertFalse(any('COUNT(' in requete['sql'] for requete in requetes.captured_queries))
+        self.assertEqual(len({commande.numero_commande for commande in commandes}), 3)
+
+    def test_bulk_import_preallocates_one_block(self):
+        attribuer_numeros([Produit(nom='Amorce')], 'serial_number', 'produit')
+        produits = [Produit(nom=f'Import {i}', prix=Decimal('1.00'), image='products/i.jpg') for i in range(50)]
+        with CaptureQueriesContext(connection) as unitaire:
+            attribuer_numeros(produits[:1], 'serial_number', 'produit')
+        with CaptureQueriesContext(connection) as bloc:
+            attribuer_numeros(produits, 'serial_number', 'produit')
+        self.assertEqual(len(bloc.captured_queries), len(unitaire.captured_queries))
+        Produit.objects.bulk_create(produits)
+        self.assertEqual(Produit.objects.values('serial_number').distinct().count(), 50)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SELECT ... FOR UPDATE requiert PostgreSQL')
+class CommandeConcurrenceTests(TransactionTestCase):
+    NB_COMMANDES = 200
+    STOCK = 50
+
+    def test_no_overselling_under_concurrent_checkouts(self):
+        produit = Produit.objects.create(nom='Édition limitée', prix=Decimal('9.90'),
+                                         stock=self.STOCK, image='products/p.jpg')
+        clients = []
+        for i in range(self.NB_COMMANDES):
+            utilisateur = creer_client(f'client{i}@example.com')
+            panier = Panier.objects.create(utilisateur=utilisateur)
+            ArticlesPanier.objects.create(panier=panier, produit=produit, quantite=1)
+            clients.append(utilisateur)
+
+        def commander(utilisateur):
+            try:
+                passer_commande(utilisateur)
+                return 'ok'
+            except CommandeRefusee:
+                return 'rupture'
+            finally:
+                connections.close_all()
+
+        # Borné par max_connections de PostgreSQL (100 par défaut)
+        with ThreadPoolExecutor(max_workers=50) as pool:
+            resultats = list(pool.map(commander, clients))
+
+        self.assertEqual(resultats.count('ok'), self.STOCK)
+        self.assertEqual(resultats.count('rupture'), self.NB_COMMANDES - self.STOCK)
+        produit.refresh_from_db()
+        self.assertEqual(produit.stock, 0)
+        self.assertEqual(ArticlesCommande.objects.filter(produit=produit).count(), self.STOCK)
+
+
+class HistoriqueCommandesTests(TestCase):
+    NB_COMMANDES = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = creer_client('fidele@example.com')
+        produits = Produit.objects.bulk_create(attribuer_numeros([
+            Produit(nom=f'Produit {i}', prix=Decimal('3.00'), image='products/p.jpg') for i in range(4)
+        ], 'serial_number', 'produit'))
+        commandes = Commande.objects.bulk_create(attribuer_numeros([
+            Commande(utilisateur=cls.utilisateur, total_prix=Decimal('6.00'))
+            for _ in range(cls.NB_COMMANDES)
+        ], 'numero_commande', 'commande'))
+        ArticlesCommande.objects.bulk_create([
+            ArticlesCommande(commande=commande, produit=produits[i % 4], quantite=1, prix_unitaire=Decimal('3.00'))
+            for commande in commandes for i in range(2)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.utilisateur)
+
+    def test_full_history_in_constant_queries(self):
+        # commandes + lignes (jointure produit)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('mes_commandes'))
+        self.assertEqual(len(response.json()), self.NB_COMMANDES)
+        self.assertEqual(len(response.json()[0]['items']), 2)
+
+    def test_cursor_pages_walk_every_order_once(self):
+        ids, cursor = [], ''
+        while True:
+            params = {'page_size': 100}
+            if cursor:
+                params['cursor'] = cursor
+            with self.assertNumQueries(2):
+                page = self.client.get(reverse('mes_commandes'), params).json()
+            ids += [commande['id'] for commande in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        attendus = list(Commande.objects.order_by('-date_commande', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, attendus)
+
+
+class SynchronisationPanierTests(TestCase):
+    def setUp(self):
+        self.utilisateur = creer_client('sync@example.com')
+        self.panier = Panier.objects.create(utilisateur=self.utilisateur)
+        self.produits = [
+            Produit.objects.create(nom=f'Article {i}', prix=Decimal('2.50'), stock=10, image='products/p.jpg')
+            for i in range(4)
+        ]
+        ArticlesPanier.objects.create(panier=self.panier, produit=self.produits[0], quantite=2)
+        ArticlesPanier.objects.create(panier=self.panier, produit=self.produits[1], quantite=1)
+        ArticlesPanier.objects.create(panier=self.panier, produit=self.produits[2], quantite=5)
+        self.client = APIClient()
+        self.client.force_authenticate(self.utilisateur)
+
+    def synchroniser(self, operations):
+        return self.client.post(reverse('synchroniser_panier'), {'operations': operations}, format='json')
+
+    def test_batch_applies_every_operation_kind(self):
+        p0, p1, p2, p3 = (produit.id for produit in self.produits)
+        response = self.synchroniser([
+            {'op': 'add', 'produit_id': p0, 'quantity': 3},
+            {'op': 'set', 'produit_id': p1, 'quantity': 4},
+            {'op': 'remove', 'produit_id': p2},
+            {'op': 'add', 'produit_id': p3},
+            {'op': 'add', 'produit_id': p3, 'quantity': 2},
+        ])
+        self.assertEqual(response.status_code, 200)
+        quantites = {item['id']: item['quantity'] for item in response.json()['items']}
+        self.assertEqual(quantites, {p0: 5, p1: 4, p3: 3})
+        self.assertEqual(response.json()['nombre_articles'], 12)
+        self.assertEqual(response.json()['total'], 30.0)
+
+    def test_negative_add_removes_the_line(self):
+        self.synchroniser([{'op': 'add', 'produit_id': self.produits[1].id, 'quantity': -3}])
+        self.assertFalse(ArticlesPanier.objects.filter(produit=self.produits[1]).exists())
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        operations = [{'op': 'add', 'produit_id': produit.id, 'quantity': 1} for produit in self.produits]
+        operations += [{'op': 'set', 'produit_id': self.produits[0].id, 'quantity': 7}]
+        # produits, panier, verrou, articles, INSERT, UPDATE groupé, UPDATE F(), relecture,
+        # réservations (lecture, stock disponible, upsert), panier recalculé, savepoints
+        with self.assertNumQueries(14):
+            self.synchroniser(operations)
+
+    def test_unknown_product_rolls_back(self):
+        response = self.synchroniser([
+            {'op': 'set', 'produit_id': self.produits[0].id, 'quantity': 9},
+            {'op': 'add', 'produit_id': 999999},
+        ])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['produits_inconnus'], [999999])
+        self.assertEqual(ArticlesPanier.objects.get(produit=self.produits[0]).quantite, 2)
+
+    def test_invalid_operation_is_rejected(self):
+        response = self.synchroniser([{'op': 'vider'}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_quantity_above_stock_is_refused(self):
+        response = self.synchroniser([
+            {'op': 'add', 'produit_id': self.produits[3].id},
+            {'op': 'set', 'produit_id': self.produits[0].id, 'quantity': 11},
+        ])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['disponible'], 10)
+        self.assertEqual(ArticlesPanier.objects.get(produit=self.produits[0]).quantite, 2)
+        self.assertFalse(ArticlesPanier.objects.filter(produit=self.produits[3]).exists())
+
+
+class ReservationStockTests(TestCase):
+    def setUp(self):
+        self.produit = Produit.objects.create(nom='Promo du jour', prix=Decimal('4.00'), stock=5,
+                                              image='products/p.jpg')
+        self.premier = creer_client('premier@example.com')
+        self.second = creer_client('second@example.com')
+
+    def ajouter(self, utilisateur, quantite):
+        synchroniser_panier(utilisateur, [{'op': 'add', 'produit_id': self.produit.id, 'quantity': quantite}])
+
+    def test_hold_blocks_other_carts(self):
+        self.ajouter(self.premier, 4)
+        with self.assertRaises(StockInsuffisant) as erreur:
+            self.ajouter(self.second, 2)
+        self.assertEqual(erreur.exception.details['disponible'], 1)
+        self.assertFalse(ArticlesPanier.objects.filter(panier__utilisateur=self.second).exists())
+        disponible = Produit.objects.avec_stock_disponible().values_list('stock_disponible', flat=True).get()
+        self.assertEqual(disponible, 1)
+
+    def test_expired_holds_are_ignored_then_purged(self):
+        self.ajouter(self.premier, 5)
+        ReservationStock.objects.update(expire_le=timezone.now() - timedelta(seconds=1))
+        self.ajouter(self.second, 5)
+        self.assertEqual(purger_reservations(), 1)
+        self.assertEqual(ReservationStock.objects.get().panier.utilisateur, self.second)
+
+    def test_checkout_consumes_the_hold(self):
+        self.ajouter(self.premier, 3)
+        passer_commande(self.premier)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock, 2)
+        self.assertFalse(ReservationStock.objects.exists())
+
+    def test_checkout_without_hold_respects_other_holds(self):
+        self.ajouter(self.premier, 4)
+        panier = Panier.objects.create(utilisateur=self.second)
+        ArticlesPanier.objects.create(panier=panier, produit=self.produit, quantite=2)
+        with self.assertRaises(CommandeRefusee):
+            passer_commande(self.second)
+
+    def test_catalogue_exposes_available_stock(self):
+        self.ajouter(self.premier, 2)
+        response = self.client.get(reverse('get_produits'))
+        self.assertEqual(response.json()[0]['stock_disponible'], 3)
+
+
+class VentesJournalieresTests(TestCase):
+    def setUp(self):
+        self.produits = [
+            Produit.objects.create(nom='Croquettes', prix=Decimal('12.00'), stock=100, image='products/a.jpg'),
+            Produit.objects.create(nom='Laisse', prix=Decimal('8.00'), stock=100, categorie='Accessoires',
+                                   image='products/b.jpg'),
+        ]
+        self.utilisateur = creer_client('ventes@example.com')
+
+    def commander(self, quantites):
+        synchroniser_panier(self.utilisateur, [
+            {'op': 'set', 'produit_id': produit.id, 'quantity': quantite}
+            for produit, quantite in zip(self.produits, quantites)
+        ])
+        return passer_commande(self.utilisateur)
+
+    def etat(self):
+        return sorted(VenteJournaliere.objects.values_list(
+            'produit_id', 'categorie', 'nombre_commandes', 'quantite', 'chiffre_affaires',
+            'quantite_payee', 'chiffre_affaires_paye',
+        ))
+
+    def test_orders_and_status_changes_update_the_aggregate(self):
+        premiere = self.commander([2, 1])
+        self.commander([1, 0])
+        croquettes, laisse = self.produits
+        self.assertEqual(self.etat(), [
+            (croquettes.id, 'Nutrition', 2, 3, Decimal('36.00'), 0, Decimal('0.00')),
+            (laisse.id, 'Accessoires', 1, 1, Decimal('8.00'), 0, Decimal('0.00')),
+        ])
+
+        premiere.statut = 'Payée'
+        premiere.save()
+        premiere.statut = 'Expédiée'
+        premiere.save()
+        self.assertEqual(self.etat()[0][5:], (2, Decimal('24.00')))
+        commande = Commande.objects.get(pk=premiere.pk)
+        commande.statut = 'En attente'
+        commande.save()
+        self.assertEqual(self.etat()[0][5:], (0, Decimal('0.00')))
+
+    def test_deferred_status_is_never_loaded(self):
+        for _ in range(3):
+            self.commander([1, 0])
+        # Ex. collecteur de suppression en cascade : une seule requête, pas une par commande
+        with self.assertNumQueries(1):
+            list(Commande.objects.only('id'))
+        commande = Commande.objects.only('id').first()
+        commande.statut = 'Payée'
+        commande.save()
+        # Ancien statut inconnu : rien n'est reporté (reconstruire corrige)
+        self.assertEqual(self.etat()[0][5:], (0, Decimal('0.00')))
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        for quantites in ([2, 1], [1, 3], [4, 0]):
+            commande = self.commander(quantites)
+        commande.statut = 'Livrée'
+        commande.save()
+        attendu = self.etat()
+        self.assertEqual(reconstruire(taille_lot=2), 3)
+        self.assertEqual(self.etat(), attendu)
+
+    def test_report_reads_only_the_aggregate(self):
+        self.commander([2, 1])
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='secret', nom='Admin', prenom='Test',
+            telephone='0000', role='Administrateur', adresse='Sfax',
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+        with CaptureQueriesContext(connection) as requetes:
+            response = client.get(reverse('rapport_ventes'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all('boutique_commande' not in requete['sql'] for requete in requetes.captured_queries))
+        self.assertEqual(Decimal(response.json()['totaux']['chiffre_affaires']), Decimal('32.00'))
+        self.assertEqual(response.json()['top_produits'][0]['produit__nom'], 'Croquettes')
+
+        client.force_authenticate(self.utilisateur)
+        self.assertEqual(client.get(reverse('rapport_ventes')).status_code, 403)
+
+
+class PlanificationPromotionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.maintenant = timezone.now()
+        self.a_venir = Produit.objects.create(
+            nom='Griffoir', prix=Decimal('30.00'), discount_percent=10, image='products/a.jpg',
+            discount_active=True, discount_start_date=self.maintenant + timedelta(hours=1),
+            discount_end_date=self.maintenant + timedelta(hours=3),
+        )
+        self.en_cours = Produit.objects.create(
+            nom='Shampoing', prix=Decimal('9.99'), discount_percent=15, image='products/b.jpg',
+            discount_active=True, discount_start_date=self.maintenant - timedelta(hours=1),
+            discount_end_date=self.maintenant + timedelta(hours=2),
+        )
+        self.sans_promotion = Produit.objects.create(nom='Brosse', prix=Decimal('5.00'), image='products/c.jpg')
+
+    def etat(self, produit):
+        produit.refresh_from_db()
+        return produit.prix_courant, produit.en_promotion
+
+    def test_save_materializes_the_current_price(self):
+        self.assertEqual(self.etat(self.en_cours), (Decimal('8.49'), True))
+        self.assertEqual(self.etat(self.a_venir), (Decimal('30.00'), False))
+        self.assertEqual(appliquer_promotions(self.maintenant), [])
+
+    def test_boundaries_are_applied_in_bulk_to_affected_products_only(self):
+        intact = self.sans_promotion.updated_at
+        self.assertEqual(prochaine_echeance(self.maintenant), self.a_venir.discount_start_date)
+
+        dans_90_minutes = self.maintenant + timedelta(minutes=90)
+        self.assertEqual(appliquer_promotions(dans_90_minutes), [self.a_venir.id])
+        self.assertEqual(self.etat(self.a_venir), (Decimal('27.00'), True))
+
+        dans_150_minutes = self.maintenant + timedelta(minutes=150)
+        self.assertEqual(appliquer_promotions(dans_150_minutes), [self.en_cours.id])
+        self.assertEqual(self.etat(self.en_cours), (Decimal('9.99'), False))
+        self.sans_promotion.refresh_from_db()
+        self.assertEqual(self.sans_promotion.updated_at, intact)
+
+    def test_detail_cache_is_invalidated_per_product(self):
+        url = reverse('produit_detail', args=[self.a_venir.id])
+        self.assertFalse(self.client.get(url).json()['en_promotion'])
+        autre = self.client.get(reverse('produit_detail', args=[self.sans_promotion.id])).json()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appliquer_promotions(self.maintenant + timedelta(minutes=90))
+        self.assertTrue(self.client.get(url).json()['en_promotion'])
+        with self.assertNumQueries(1):  # ETag seulement, le corps vient du cache
+            self.assertEqual(self.client.get(reverse('produit_detail', args=[self.sans_promotion.id])).json(), autre)
+
+    def test_full_pass_repairs_queryset_updates(self):
+        Produit.objects.filter(pk=self.sans_promotion.pk).update(prix=Decimal('6.00'))
+        self.assertEqual(appliquer_promotions(self.maintenant), [])
+        self.assertEqual(appliquer_promotions(self.maintenant, complet=True), [self.sans_promotion.id])
+        self.assertEqual(self.etat(self.sans_promotion), (Decimal('6.00'), False))
+
+
+class AssociationsTests(TestCase):
+    def setUp(self):
+        self.utilisateur = creer_client('associations@example.com')
+        self.croquettes, self.gamelle, self.laisse, self.collier = Produit.objects.bulk_create(attribuer_numeros([
+            Produit(nom=nom, prix=Decimal('5.00'), image='products/p.jpg')
+            for nom in ('Croquettes', 'Gamelle', 'Laisse', 'Collier')
+        ], 'serial_number', 'produit'))
+
+    def commander(self, *produits, il_y_a=timedelta(hours=1)):
+        commande = Commande.objects.create(utilisateur=self.utilisateur, total_prix=0)
+        Commande.objects.filter(pk=commande.pk).update(date_commande=timezone.now() - il_y_a)
+        ArticlesCommande.objects.bulk_create([ArticlesCommande(commande=commande, produit=p) for p in produits])
+
+    def associes(self, produit):
+        return [associe['id'] for associe in self.client.get(reverse('produits_associes', args=[produit.id])).json()]
+
+    def test_vectorized_and_pure_python_counts_agree(self):
+        lignes = [(1, 10), (1, 11), (2, 10), (2, 11), (2, 12), (3, 12), (3, 12)]
+        attendu = {(10, 10): 2, (10, 11): 2, (10, 12): 1, (11, 11): 2, (11, 12): 1, (12, 12): 2}
+        self.assertEqual(associations.compter_paires(lignes), attendu)
+        sparse = associations.sparse
+        associations.sparse = None
+        try:
+            self.assertEqual(associations.compter_paires(lignes), attendu)
+        finally:
+            associations.sparse = sparse
+
+    def test_incremental_job_and_endpoint(self):
+        self.commander(self.croquettes, self.gamelle)
+        self.commander(self.croquettes, self.gamelle, self.laisse)
+        self.commander(self.laisse, self.collier)
+        self.assertEqual(associations.calculer_associations(taille_lot=2), 3)
+        self.assertEqual(self.associes(self.croquettes), [self.gamelle.id, self.laisse.id])
+
+        # Commande trop récente : attend le prochain passage
+        self.commander(self.croquettes, self.collier, il_y_a=timedelta(0))
+        self.commander(self.croquettes, self.collier)
+        self.assertEqual(associations.calculer_associations(), 0)
+
+        with self.assertNumQueries(1):
+            self.associes(self.collier)
+        self.assertEqual(associations.calculer_associations(complet=True), 3)
+        self.assertEqual(ProduitAssocie.objects.get(produit=self.collier, rang=1).associe, self.laisse)
+
+
+class FacettesProduitsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        maintenant = timezone.now()
+        Produit.objects.bulk_create(attribuer_numeros([
+            Produit(nom='Croquettes', prix=Decimal('8.00'), categorie='Nutrition', image='p.jpg'),
+            Produit(nom='Pâtée', prix=Decimal('12.00'), categorie='Nutrition', image='p.jpg',
+                    discount_active=True, discount_percent=50, discount_start_date=maintenant - timedelta(days=1),
+                    discount_end_date=maintenant + timedelta(days=1)),
+            Produit(nom='Laisse', prix=Decimal('30.00'), categorie='Accessoires', image='p.jpg'),
+            Produit(nom='Niche', prix=Decimal('120.00'), categorie='Accessoires', image='p.jpg'),
+        ], 'serial_number', 'produit'))
+
+    def facettes(self, **params):
+        response = self.client.get(reverse('get_produits'), dict(params, facets=1))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data['total'], {
+            facette: {str(entree['valeur']): entree['nombre'] for entree in valeurs}
+            for facette, valeurs in data['facettes'].items()
+        }
+
+    def test_each_facet_is_counted_with_the_other_filters(self):
+        total, facettes = self.facettes(categorie='Nutrition')
+        self.assertEqual(total, 2)
+        # La facette filtrée garde les comptes des autres valeurs
+        self.assertEqual(facettes['categorie']['Nutrition'], 2)
+        self.assertEqual(facettes['categorie']['Accessoires'], 2)
+        self.assertEqual(facettes['categorie']['Hygiène'], 0)
+        self.assertEqual(facettes['tranche_prix'], {'0-10': 2, '10-25': 0, '25-50': 0, '50+': 0})
+        self.assertEqual(facettes['en_promotion'], {'True': 1, 'False': 1})
+
+        total, facettes = self.facettes(categorie='Accessoires', tranche_prix='25-50')
+        self.assertEqual(total, 1)
+        self.assertEqual(facettes['tranche_prix'], {'0-10': 0, '10-25': 0, '25-50': 1, '50+': 1})
+        self.assertEqual(facettes['categorie'], {'Nutrition': 0, 'Accessoires': 1, 'Hygiène': 0})
+
+        filtree = self.client.get(reverse('get_produits'), {'tranche_prix': '0-10'}).json()
+        self.assertEqual(sorted(p['nom'] for p in filtree), ['Croquettes', 'Pâtée'])
+        self.assertEqual(self.client.get(reverse('get_produits'), {'tranche_prix': '5-6'}).status_code, 400)
+
+    def test_single_query_then_cached_until_a_product_changes(self):
+        with self.assertNumQueries(1):
+            self.facettes(on_sale=1)
+        with self.assertNumQueries(0):
+            total, _ = self.facettes(on_sale=1)
+        self.assertEqual(total, 1)
+
+        maintenant = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            Produit.objects.create(
+                nom='Friandises', prix=Decimal('4.00'), categorie='Nutrition', image='p.jpg',
+                discount_active=True, discount_percent=10, discount_start_date=maintenant - timedelta(hours=1),
+                discount_end_date=maintenant + timedelta(hours=1),
+            )
+            # Invalidation au commit seulement
+            self.assertEqual(self.facettes(on_sale=1)[0], 1)
+        total, _ = self.facettes(on_sale=1)
+        self.assertEqual(total, 2)
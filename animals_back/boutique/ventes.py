@@ -0,0 +1,134 @@
+# boutique/ventes.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, Max, Value, When
+from django.utils import timezone
+
+from .models import ArticlesCommande, Commande, VenteJournaliere
+
+# Statuts à partir desquels une commande compte dans les colonnes *_payees
+STATUTS_PAYES = ('Payée', 'Expédiée', 'Livrée')
+
+METRIQUES = ('nombre_commandes', 'quantite', 'chiffre_affaires', 'quantite_payee', 'chiffre_affaires_paye')
+
+
+def _ajouter_ligne(deltas, jour, produit_id, categorie, quantite, prix_unitaire, paye, signe=1, commande=True):
+    delta = deltas[(produit_id, jour, categorie)]
+    montant = Decimal(prix_unitaire) * quantite
+    if commande:
+        delta['nombre_commandes'] += signe
+        delta['quantite'] += signe * quantite
+        delta['chiffre_affaires'] += signe * montant
+    if paye:
+        delta['quantite_payee'] += signe * quantite
+        delta['chiffre_affaires_paye'] += signe * montant
+
+
+def _nouveaux_deltas():
+    return defaultdict(lambda: dict.fromkeys(METRIQUES, 0))
+
+
+def cumuler(deltas):
+    """
+    Ajoute `deltas` ({(produit_id, jour, categorie): {métrique: valeur}}) à la table.
+    Trois requêtes quel que soit le nombre de clés : création des lignes manquantes,
+    verrouillage des lignes par clé primaire croissante (pas d'interblocage entre
+    deux commandes concurrentes), puis un seul UPDATE par incréments F().
+    """
+    if not deltas:
+        return
+    with transaction.atomic():
+        VenteJournaliere.objects.bulk_create(
+            [VenteJournaliere(produit_id=produit_id, jour=jour, categorie=categorie)
+             for produit_id, jour, categorie in deltas],
+            ignore_conflicts=True,
+        )
+        lignes = (
+            VenteJournaliere.objects.select_for_update()
+            .filter(produit_id__in={cle[0] for cle in deltas}, jour__in={cle[1] for cle in deltas})
+            .order_by('pk')
+            .values_list('pk', 'produit_id', 'jour', 'categorie')
+        )
+        par_pk = {
+            pk: deltas[(produit_id, jour, categorie)]
+            for pk, produit_id, jour, categorie in lignes
+            if (produit_id, jour, categorie) in deltas
+        }
+
+        champs = {}
+        for metrique in METRIQUES:
+            whens = [When(pk=pk, then=Value(delta[metrique])) for pk, delta in par_pk.items() if delta[metrique]]
+            if whens:
+                output_field = VenteJournaliere._meta.get_field(metrique)
+                champs[metrique] = F(metrique) + Case(*whens, default=Value(0), output_field=output_field)
+        if champs:
+            VenteJournaliere.objects.filter(pk__in=par_pk).update(**champs)
+
+
+def enregistrer_commande(commande, lignes):
+    """ `lignes` : (produit_id, categorie, quantite, prix_unitaire) de la commande qui vient d'être créée. """
+    deltas = _nouveaux_deltas()
+    jour = timezone.localdate(commande.date_commande)
+    for produit_id, categorie, quantite, prix_unitaire in lignes:
+        _ajouter_ligne(deltas, jour, produit_id, categorie, quantite, prix_unitaire,
+                       paye=commande.statut in STATUTS_PAYES)
+    cumuler(deltas)
+
+
+def statut_modifie(commande, ancien_statut):
+    """
+    Reporte un passage de la commande vers (ou depuis) un statut payé sur les colonnes *_payees.
+    `ancien_statut` None : statut différé au chargement, donc inconnu ; rien n'est
+    reporté (comme pour un QuerySet.update(), reconstruire_ventes corrige).
+    """
+    if ancien_statut is None:
+        return
+    etait_paye = ancien_statut in STATUTS_PAYES
+    est_paye = commande.statut in STATUTS_PAYES
+    if etait_paye == est_paye:
+        return
+    deltas = _nouveaux_deltas()
+    jour = timezone.localdate(commande.date_commande)
+    lignes = ArticlesCommande.objects.filter(commande=commande).values_list(
+        'produit_id', 'produit__categorie', 'quantite', 'prix_unitaire'
+    )
+    for produit_id, categorie, quantite, prix_unitaire in lignes:
+        _ajouter_ligne(deltas, jour, produit_id, categorie, quantite, prix_unitaire,
+                       paye=True, signe=1 if est_paye else -1, commande=False)
+    cumuler(deltas)
+
+
+def reconstruire(taille_lot=1000, progression=None):
+    """
+    Recalcule toute la table depuis l'historique, par lots de `taille_lot` commandes
+    (pagination par id, une transaction courte par lot). Les commandes créées
+    pendant la reconstruction sont comptées par le chemin incrémental ; à lancer
+    de préférence en période creuse, les changements de statut concurrents
+    pouvant être comptés deux fois.
+    """
+    with transaction.atomic():
+        dernier_id = Commande.objects.aggregate(dernier=Max('id'))['dernier'] or 0
+        VenteJournaliere.objects.all().delete()
+
+    curseur, traitees = 0, 0
+    while True:
+        ids = list(
+            Commande.objects.filter(id__gt=curseur, id__lte=dernier_id)
+            .order_by('id').values_list('id', flat=True)[:taille_lot]
+        )
+        if not ids:
+            return traitees
+        deltas = _nouveaux_deltas()
+        lignes = ArticlesCommande.objects.filter(commande_id__in=ids).values_list(
+            'produit_id', 'produit__categorie', 'quantite', 'prix_unitaire',
+            'commande__date_commande', 'commande__statut',
+        )
+        for produit_id, categorie, quantite, prix_unitaire, date_commande, statut in lignes:
+            _ajouter_ligne(deltas, timezone.localdate(date_commande), produit_id, categorie,
+                           quantite, prix_unitaire, paye=statut in STATUTS_PAYES)
+        cumuler(deltas)
+        curseur, traitees = ids[-1], traitees + len(ids)
+        if progression:
+            progression(traitees)
@@ -1,53 +1,172 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, QueryDict
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth.decorators import login_required
-from .models import Notification, Produit, Panier, ArticlesPanier, Commande, ArticlesCommande
+from .models import Notification, Produit, Panier, ArticlesPanier, Commande, ArticlesCommande, ProduitAssocie, ReservationStock, VenteJournaliere
 import json
-from django.db import transaction
+from django.db.models import Prefetch, Sum
+from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.views import APIView
+from .facettes import compter_facettes, condition_tranche, tranches_prix
 from .serializers import CommandeDetailSerializer, NotificationSerializer, ProduitSerializer
-from decimal import Decimal
-from django.db import transaction
+from .services import CommandeRefusee, RequeteRefusee, contenu_panier, passer_commande, synchroniser_panier
+from accounts.authentication import authentification_sans_requete
+from animals.cache import cle_reponse, obtenir_ou_construire, validateurs_http
+from animals.pagination import PaginationInvalide, paginer_par_curseur, pagination_demandee
+from animals.search import moteur_pour
+from datetime import date, timedelta
 
 # Existing views
-def get_produits(request):
-    products = Produit.objects.all()
-    
-    # Apply category filter
-    categorie = request.GET.get('categorie')
-    animal = request.GET.get('animal')
 
-    if categorie:
-        products = products.filter(categorie=categorie)
+# Tris acceptés par get_produits, couverts par un index de Produit.Meta
+# (effective_price : prix matérialisé prix_courant)
+ORDRES_PRODUITS = {
+    'prix': ('prix', 'id'),
+    '-prix': ('-prix', '-id'),
+    'date_ajout': ('date_ajout', 'id'),
+    '-date_ajout': ('-date_ajout', '-id'),
+    'stock': ('stock', 'id'),
+    '-stock': ('-stock', '-id'),
+    'effective_price': ('prix_courant', 'id'),
+    '-effective_price': ('-prix_courant', '-id'),
+}
+
+
+def _filtres_facettes(params):
+    """ Filtres de la grille correspondant à une facette : {facette: valeur}. """
+    filtres = {}
+    if params.get('categorie'):
+        filtres['categorie'] = params['categorie']
+    if params.get('tranche_prix'):
+        if params['tranche_prix'] not in tranches_prix():
+            raise ValueError(params['tranche_prix'])
+        filtres['tranche_prix'] = params['tranche_prix']
+    if params.get('on_sale') in ('1', 'true'):
+        filtres['en_promotion'] = True
+    return filtres
+
+
+def _produits_filtres(products, params, filtres):
+    animal = params.get('animal')
     if animal:
         products = products.filter(animal=animal)
-    # Apply search
-    search = request.GET.get('search')
+    if 'categorie' in filtres:
+        products = products.filter(categorie=filtres['categorie'])
+    if 'tranche_prix' in filtres:
+        products = products.filter(condition_tranche(filtres['tranche_prix']))
+    if 'en_promotion' in filtres:
+        products = products.filter(en_promotion=True)
+    return products
+
+
+def _facettes_produits(params, filtres):
+    """
+    `?facets=1` : comptes par catégorie, tranche de prix et promotion pour la
+    recherche courante, en une requête groupée mise en cache par signature de filtre
+    (version `produits`, changée à chaque écriture de produit).
+    """
+    signature = QueryDict(mutable=True)
+    for cle in ('categorie', 'animal', 'tranche_prix', 'on_sale', 'search'):
+        if params.get(cle):
+            signature[cle] = params[cle]
+
+    def construire():
+        products = _produits_filtres(Produit.objects.all(), params, {})
+        search = params.get('search', '').strip()
+        if search:
+            products = moteur_pour(Produit).rechercher(products, search)
+        return compter_facettes(products, filtres)
+
+    return obtenir_ou_construire(
+        cle_reponse('produits:facettes', signature, version_nom='produits'), construire
+    )
+
+
+def get_produits(request):
+    params = request.GET
+    try:
+        filtres = _filtres_facettes(params)
+    except ValueError as e:
+        return JsonResponse({
+            'error': f"Tranche de prix inconnue : {e}",
+            'allowed': list(tranches_prix()),
+        }, status=400)
+
+    if params.get('facets') in ('1', 'true'):
+        return JsonResponse(_facettes_produits(params, filtres))
+
+    products = _produits_filtres(
+        Produit.objects.avec_prix_effectif().avec_stock_disponible(), params, filtres
+    )
+
+    ordering = params.get('ordering')
+    if ordering and ordering not in ORDRES_PRODUITS:
+        return JsonResponse({
+            'error': f"Tri non autorisé : {ordering}",
+            'allowed': list(ORDRES_PRODUITS),
+        }, status=400)
+
+    # Apply search (classée par pertinence sauf tri explicite)
+    ordre = ('id',)
+    search = params.get('search', '').strip()
     if search:
-        products = products.filter(nom__icontains=search)
-    
-    # Apply ordering
-    ordering = request.GET.get('ordering')
+        products = moteur_pour(Produit).rechercher(products, search)
+        ordre = ('-pertinence', '-id')
     if ordering:
-        products = products.order_by(ordering)
-    
+        ordre = ORDRES_PRODUITS[ordering]
+
+    if pagination_demandee(params):
+        try:
+            products, next_cursor = paginer_par_curseur(products, params, ordre=ordre)
+        except PaginationInvalide as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        serializer = ProduitSerializer(products, many=True, context={'request': request})
+        return JsonResponse({'results': serializer.data, 'next_cursor': next_cursor})
+
     # Return values as list
-    serializer = ProduitSerializer(products, many=True, context={'request': request})
+    serializer = ProduitSerializer(products.order_by(*ordre), many=True, context={'request': request})
     return JsonResponse(serializer.data, safe=False)
 
+@validateurs_http(Produit, 'produit', kwarg='produit_id')
 def produit_detail(request, produit_id):
-    product = Produit.objects.filter(id=produit_id).values('id', 'nom', 'description', 'prix', 'image', 'categorie').first()
+    def construire():
+        return Produit.objects.filter(id=produit_id).values(
+            'id', 'nom', 'description', 'prix', 'image', 'categorie', 'prix_courant', 'en_promotion'
+        ).first()
+
+    # Version propre au produit : changée par ses enregistrements et par planifier_promotions
+    product = obtenir_ou_construire(
+        cle_reponse(f'produit:{produit_id}', version_nom=f'produit:{produit_id}'), construire
+    )
     if product:
         return JsonResponse(product)
     else:
         return JsonResponse({'error': 'Product not found'}, status=404)
 
+def produits_associes(request, produit_id):
+    """ "Frequently bought together", read from the table built by calculer_associations. """
+    associes = ProduitAssocie.objects.filter(produit_id=produit_id).order_by('rang').values(
+        'score', 'nombre', 'associe_id', 'associe__nom', 'associe__image', 'associe__prix_courant',
+        'associe__en_promotion',
+    )
+    return JsonResponse([
+        {
+            'id': associe['associe_id'],
+            'nom': associe['associe__nom'],
+            'image': associe['associe__image'],
+            'prix': associe['associe__prix_courant'],
+            'en_promotion': associe['associe__en_promotion'],
+            'score': round(associe['score'], 4),
+            'nombre_commandes': associe['nombre'],
+        }
+        for associe in associes
+    ], safe=False)
+
 # New cart views
 
 
@@ -55,22 +174,22 @@ def produit_detail(request, produit_id):
 @login_required
 def get_panier(request):
     panier, created = Panier.objects.get_or_create(utilisateur=request.user)
-    articles = ArticlesPanier.objects.filter(panier=panier).select_related('produit')
-    
-    cart_items = []
-    for article in articles:
-        produit = article.produit
-        effective_price = produit.prix_promotion if produit.is_discount_active else produit.prix
-        
-        cart_items.append({
-            'id': produit.id,
-            'nom': produit.nom,
-            'prix': float(effective_price),
-            'image': produit.image.url if produit.image else None,
-            'quantity': article.quantite
-        })
-    
-    return Response(cart_items)
+    return Response(contenu_panier(panier)['items'])
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def synchroniser_panier_view(request):
+    """
+    Apply a batch of cart operations and return the recomputed cart:
+    {"operations": [{"op": "set"|"add"|"remove", "produit_id": 1, "quantity": 2}, ...]}
+    """
+    try:
+        panier = synchroniser_panier(request.user, request.data.get('operations'))
+    except RequeteRefusee as e:
+        # PanierInvalide (400/404) ou StockInsuffisant (409)
+        return Response({'error': e.message, **e.details}, status=e.status)
+    return Response(contenu_panier(panier))
 
 @api_view(['POST'])
 @login_required
@@ -79,15 +198,11 @@ def ajouter_au_panier(request):
     produit_id = data.get('produit_id')
     quantite = data.get('quantity', 1)
     produit = get_object_or_404(Produit, id=produit_id)
-    panier, created = Panier.objects.get_or_create(utilisateur=request.user)
-    article, created = ArticlesPanier.objects.get_or_create(
-        panier=panier,
-        produit=produit,
-        defaults={'quantite': quantite}
-    )
-    if not created:
-        article.quantite += quantite
-        article.save()
+    try:
+        # Incrément en base (F) et réservation du stock, voir services.synchroniser_panier
+        synchroniser_panier(request.user, [{'op': 'add', 'produit_id': produit.id, 'quantity': quantite}])
+    except RequeteRefusee as e:
+        return Response({'error': e.message, **e.details}, status=e.status)
     return Response({'status': 'success', 'message': 'Produit ajouté au panier'})
 
 
@@ -123,12 +238,9 @@ def update_quantite(request, produit_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get or create user's cart
-        panier, created = Panier.objects.get_or_create(utilisateur=request.user)
-        
         # Check if product exists
         try:
-            produit = Produit.objects.get(id=produit_id)
+            produit = Produit.objects.avec_prix_effectif().get(id=produit_id)
         except Produit.DoesNotExist:
             return Response(
                 {'error': 'Product not found'}, 
@@ -138,19 +250,13 @@ def update_quantite(request, produit_id):
         # Handle quantity update
         quantity = int(quantity)  # Ensure integer quantity
         
+        try:
+            synchroniser_panier(request.user, [{'op': 'set', 'produit_id': produit_id, 'quantity': quantity}])
+        except RequeteRefusee as e:
+            return Response({'error': e.message, **e.details}, status=e.status)
+
         if quantity > 0:
-            article, created = ArticlesPanier.objects.get_or_create(
-                panier=panier,
-                produit_id=produit_id,
-                defaults={'quantite': quantity}
-            )
-            
-            if not created:
-                article.quantite = quantity
-                article.save()
-            
-            # Calculate effective price based on discount status
-            effective_price = float(produit.prix_promotion if produit.is_discount_active else produit.prix)
+            effective_price = float(produit.effective_price)
             
             return Response({
                 'success': True, 
@@ -164,8 +270,7 @@ def update_quantite(request, produit_id):
                 }
             })
         else:
-            # Remove item if quantity is 0
-            ArticlesPanier.objects.filter(panier=panier, produit_id=produit_id).delete()
+            # Item removed (quantity 0)
             return Response({
                 'success': True, 
                 'message': 'Product removed from cart'
@@ -196,6 +301,7 @@ def supprimer_du_panier(request, produit_id):
     try:
         article = ArticlesPanier.objects.get(panier=panier, produit_id=produit_id)
         article.delete()
+        ReservationStock.objects.filter(panier=panier, produit_id=produit_id).delete()
         return Response({'success': True, 'message': 'Product removed from cart'})
     except ArticlesPanier.DoesNotExist:
         return Response({'error': 'Product not in cart'}, status=status.HTTP_404_NOT_FOUND)
@@ -209,77 +315,22 @@ def creer_commande(request):
     adresse_livraison = data.get('adresse_livraison', '')
     telephone = data.get('telephone', '')
     methode_paiement = data.get('methode_paiement', 'livraison')
-    
+
     try:
-        panier = Panier.objects.get(utilisateur=request.user)
-    except Panier.DoesNotExist:
-        return Response({'error': 'Cart not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    articles = ArticlesPanier.objects.filter(panier=panier).select_related('produit')
-    
-    if not articles:
-        return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    with transaction.atomic():
-        # Validate inventory first
-        for article in articles:
-            if article.produit.stock < article.quantite:
-                return Response({
-                    'error': f'Not enough stock for {article.produit.nom}. Available: {article.produit.stock}'
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-        # Calculate total price with discounts
-        total_prix = Decimal('0')
-        for article in articles:
-            produit = article.produit
-            if produit.is_discount_active:
-                prix = produit.prix_promotion  # Uses discounted price
-            else:
-                prix = produit.prix  # Regular price
-            
-            total_prix += prix * article.quantite
-
-        # Create order
-        commande = Commande.objects.create(
-            utilisateur=request.user,
-            total_prix=total_prix,
-            statut="En attente",
-            adresse_livraison=adresse_livraison,
-            telephone=telephone,
-            methode_paiement=methode_paiement
-        )
-        
-        # Create order items with individual prices
-        for article in articles:
-            produit = article.produit
-            if produit.is_discount_active:
-                prix_unitaire = produit.prix_promotion
-            else:
-                prix_unitaire = produit.prix
-            
-            ArticlesCommande.objects.create(
-                commande=commande,
-                produit=produit,
-                quantite=article.quantite,
-                prix_unitaire=prix_unitaire  # Store exact price at order time
-            )
-            
-            # Reduce inventory
-            
-            produit.save()
+        commande = passer_commande(request.user, adresse_livraison, telephone, methode_paiement)
+    except CommandeRefusee as e:
+        return Response({'error': e.message, **e.details}, status=e.status)
 
-        # Clear cart
-        articles.delete()
-        
-        return Response({
-            'success': True,
-            'message': 'Order created successfully',
-            'numero_commande': commande.numero_commande
-        })
+    return Response({
+        'success': True,
+        'message': 'Order created successfully',
+        'numero_commande': commande.numero_commande
+    })
 class NotificationView(APIView):
+    authentication_classes = authentification_sans_requete()
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        notifications = Notification.objects.filter(utilisateur=request.user, lu=False)
+        notifications = Notification.objects.filter(utilisateur_id=request.user.id, lu=False)
         serializer = NotificationSerializer(notifications, many=True)
         return Response(serializer.data)
 class NotificationMarkReadView(APIView):
@@ -296,6 +347,63 @@ class NotificationMarkReadView(APIView):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def mes_commandes(request):
-    commandes = Commande.objects.filter(utilisateur=request.user).order_by('-date_commande')
-    serializer = CommandeDetailSerializer(commandes, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    params = request.query_params
+    ordre = ('-date_commande', '-id')
+    commandes = Commande.objects.filter(utilisateur=request.user).prefetch_related(
+        Prefetch('articlescommande_set', queryset=ArticlesCommande.objects.select_related('produit').order_by('id'))
+    )
+    if pagination_demandee(params):
+        try:
+            commandes, next_cursor = paginer_par_curseur(commandes, params, ordre=ordre)
+        except PaginationInvalide as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = CommandeDetailSerializer(commandes, many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
+    serializer = CommandeDetailSerializer(commandes.order_by(*ordre), many=True)
+    return Response(serializer.data)
+
+RAPPORT_VENTES_MAX_JOURS = 366
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def rapport_ventes(request):
+    """
+    Sales dashboard served from VenteJournaliere only (never scans orders):
+    ?debut=YYYY-MM-DD&fin=YYYY-MM-DD (30 last days by default) &categorie=
+    """
+    params = request.query_params
+    try:
+        fin = date.fromisoformat(params['fin']) if params.get('fin') else timezone.localdate()
+        debut = date.fromisoformat(params['debut']) if params.get('debut') else fin - timedelta(days=29)
+    except ValueError:
+        return Response({'error': 'Dates attendues au format YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if debut > fin or (fin - debut).days >= RAPPORT_VENTES_MAX_JOURS:
+        return Response(
+            {'error': f'Période invalide (au plus {RAPPORT_VENTES_MAX_JOURS} jours)'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    ventes = VenteJournaliere.objects.filter(jour__range=(debut, fin))
+    if params.get('categorie'):
+        ventes = ventes.filter(categorie=params['categorie'])
+    sommes = {
+        'nombre_commandes': Sum('nombre_commandes'),
+        'quantite': Sum('quantite'),
+        'chiffre_affaires': Sum('chiffre_affaires'),
+        'quantite_payee': Sum('quantite_payee'),
+        'chiffre_affaires_paye': Sum('chiffre_affaires_paye'),
+    }
+    # nombre_commandes compte les commandes par produit : pas de total global sans double compte
+    totaux = ventes.aggregate(**{nom: somme for nom, somme in sommes.items() if nom != 'nombre_commandes'})
+    return Response({
+        'debut': debut,
+        'fin': fin,
+        'totaux': {nom: valeur or 0 for nom, valeur in totaux.items()},
+        'par_jour': list(ventes.values('jour').annotate(**sommes).order_by('jour')),
+        'par_categorie': list(ventes.values('categorie').annotate(**sommes).order_by('categorie')),
+        'top_produits': list(
+            ventes.values('produit_id', 'produit__nom').annotate(**sommes).order_by('-chiffre_affaires')[:10]
+        ),
+    })